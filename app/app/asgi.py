@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+from core.async_views import close_request_connections  # noqa: E402
+
+request_finished.connect(close_request_connections)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.QueryReportMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,16 +88,116 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Workers keep their connection for DB_CONN_MAX_AGE seconds (0 closes it
+# after every request) and ping it before reuse (see core.db). Set
+# DB_PGBOUNCER=1 when DB_HOST/DB_PORT point at PgBouncer in transaction
+# pooling mode, where server-side cursors cannot outlive a transaction.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(int(
+            os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(
+            os.environ.get('DB_PGBOUNCER', 0))),
+    }
+}
+
+
+# Under ASGI (scripts/run_asgi.sh), recipe, tag and ingredient reads run
+# on a pool of this many threads per process, each holding a database
+# connection; see core.async_views.
+
+ASYNC_READ_VIEWS = bool(int(os.environ.get('ASYNC_READ_VIEWS', 0)))
+ASYNC_DB_WORKERS = int(os.environ.get('ASYNC_DB_WORKERS', 16))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) so all
+# workers see the same entries. With a process-local backend and more
+# than one SERVER_PROCESSES, caches that must agree between processes
+# are not used (see core.caches) and the token deny-list refuses to run.
+
+SERVER_PROCESSES = int(os.environ.get('SERVER_PROCESSES', 1))
+PROCESS_LOCAL_CACHE_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+]
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# Resolved auth tokens (user.authentication). The shared tier is skipped
+# unless AUTH_TOKEN_CACHE_ALIAS is shared by every process (core.caches);
+# set it to '' to keep only the in-process tier; its entries are not dropped in
+# other processes on revocation, so keep its timeout short.
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS', 'default')
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.environ.get('AUTH_TOKEN_LOCAL_CACHE_SIZE', 10000))
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = int(
+    os.environ.get('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 5))
+
+# Signed access/refresh tokens (user.tokens). AUTH_SIGNING_KEYS holds
+# "version:secret" pairs; keep retired versions listed until the tokens
+# they signed have expired, and rotate by adding a new version and
+# pointing AUTH_SIGNING_KEY_VERSION at it.
+AUTH_SIGNING_KEYS = dict(
+    pair.split(':', 1)
+    for pair in os.environ.get('AUTH_SIGNING_KEYS', '').split(',') if pair
+) or {'1': SECRET_KEY}
+AUTH_SIGNING_KEY_VERSION = os.environ.get('AUTH_SIGNING_KEY_VERSION', '1')
+AUTH_ACCESS_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_ACCESS_TOKEN_LIFETIME', 300))
+AUTH_REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600))
+# Revoked token ids; must be shared by every process (user.checks).
+AUTH_DENY_LIST_CACHE_ALIAS = os.environ.get(
+    'AUTH_DENY_LIST_CACHE_ALIAS', 'default')
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+# Hashes by any listed hasher other than the first are upgraded to the
+# first on the next successful login (user.backends).
+
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,'
+    'django.contrib.auth.hashers.Argon2PasswordHasher,'
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher,'
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+).split(',')
+
+AUTHENTICATION_BACKENDS = ['user.backends.PooledModelBackend']
+
+# Password checks per process: hashing threads, and how many checks may
+# be running or queued before further logins get a 503. Each waits in a
+# request thread, so keep LOGIN_MAX_PENDING below the threads per worker
+# (scripts/run.sh derives both from WSGI_THREADS).
+LOGIN_HASH_WORKERS = int(os.environ.get('LOGIN_HASH_WORKERS', 1))
+LOGIN_MAX_PENDING = int(os.environ.get('LOGIN_MAX_PENDING', 1))
+LOGIN_TIMEOUT = float(os.environ.get('LOGIN_TIMEOUT', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -138,6 +241,23 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Recipe image renditions (recipe.images): longest side in pixels per
+# rendition, each written as WebP and JPEG by a per-process worker pool.
+# RECIPE_IMAGE_SYNC renders on commit in the request instead.
+RECIPE_IMAGE_RENDITIONS = {'thumb': 160, 'medium': 640, 'large': 1280}
+RECIPE_IMAGE_QUALITY = int(os.environ.get('RECIPE_IMAGE_QUALITY', 80))
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_SYNC = bool(int(os.environ.get('RECIPE_IMAGE_SYNC', 0)))
+
+# Upload limits checked from the file size and image header, before any
+# decoding (recipe.uploads). Keep the size in line with nginx's
+# client_max_body_size.
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20))
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -147,8 +267,37 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('LOGIN_RATE', '30/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '10/min'),
+    },
 }
 
+# Request metrics (core.metrics): per-request Server-Timing headers, and
+# /metrics for Prometheus, which needs "Bearer <METRICS_TOKEN>". Without
+# a token it is only served with DEBUG on.
+
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 1)))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Directory the worker processes share their metrics through; empty
+# serves only those of the process answering the scrape.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(
+    os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# Share of requests whose queries core.middleware.QueryReportMiddleware
+# checks (0 in production, some in staging). It logs query shapes run
+# more than QUERY_REPORT_MAX_REPEATS times and queries over the slow mark.
+
+QUERY_REPORT_SAMPLE_RATE = float(
+    os.environ.get('QUERY_REPORT_SAMPLE_RATE', 0))
+QUERY_REPORT_MAX_REPEATS = int(os.environ.get('QUERY_REPORT_MAX_REPEATS', 3))
+QUERY_REPORT_SLOW_MS = float(os.environ.get('QUERY_REPORT_SLOW_MS', 100))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
\ No newline at end of file
@@ -22,6 +22,8 @@ from drf_spectacular.views import (
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(),
@@ -30,6 +32,7 @@ urlpatterns = [
          name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
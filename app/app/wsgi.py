@@ -7,10 +7,19 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf, and with it every view, serializer and DRF module,
+# while uWSGI loads the app in its master, so forked workers share those
+# pages instead of importing them on their first request. Freezing keeps
+# the garbage collector from writing to (and so copying) them later.
+get_resolver().url_patterns
+gc.freeze()
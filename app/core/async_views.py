@@ -0,0 +1,132 @@
+"""
+Concurrent read views for the ASGI deployment.
+
+Django 4.0 has no async ORM and DRF no async views. Under ASGI, Django
+runs the sync code of each request on a new thread of its own, so
+requests do run concurrently, but every one opens a database connection
+that is never reused and the number of threads is unbounded.
+`async_reads` turns a sync view into an async one that runs GET and
+HEAD on a pool of ASYNC_DB_WORKERS threads that keep their connections,
+while the event loop keeps accepting requests. Writes keep Django's
+thread per request; app.asgi closes its connections when the request
+finishes (`close_request_connections`).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from core import db, metrics, queries
+
+READ_METHODS = ('GET', 'HEAD')
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    """The pool of this process, created after any fork."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_WORKERS,
+                thread_name_prefix='async-db',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def close_connections():
+    """Close the pool threads' connections and retire the pool."""
+    global _executor, _executor_pid
+    with _lock:
+        executor = _executor if _executor_pid == os.getpid() else None
+        _executor = _executor_pid = None
+    if executor is None:
+        return
+    # One job per thread: none returns until every thread holds one.
+    barrier = threading.Barrier(settings.ASYNC_DB_WORKERS)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    wait([executor.submit(close)
+          for _ in range(settings.ASYNC_DB_WORKERS)])
+    executor.shutdown()
+
+
+def close_request_connections(**kwargs):
+    """request_finished receiver closing the request thread's connections.
+
+    The thread ends with the request, so a connection kept for
+    CONN_MAX_AGE would only be closed once garbage-collected.
+    """
+    connections.close_all()
+
+
+def _call_in_worker(func, args, kwargs):
+    # What the request_started/finished signals do for the main thread.
+    close_old_connections()
+    db.check_connections()
+    try:
+        with metrics.timed_queries(), queries.recorded_queries():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run sync `func` on a pool thread and wait for it."""
+    loop = asyncio.get_running_loop()
+    # Carry the request's context over, e.g. its metrics.current.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_executor(), context.run, _call_in_worker, func, args, kwargs)
+
+
+def _rendered(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    # Serialize on the same thread as the queries, not the event loop.
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def async_reads(view):
+    """Async version of sync `view` that serves reads on the pool."""
+    write = sync_to_async(_rendered, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await run_in_pool(_rendered, view, request,
+                                     *args, **kwargs)
+        return await write(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def async_read_urls(patterns, exclude=()):
+    """`patterns` with async_reads views when ASYNC_READ_VIEWS is set.
+
+    Views named in `exclude` are left alone; streaming responses must
+    be, as Django 4.0 iterates them on the event loop.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return patterns
+    return [
+        pattern if pattern.name in exclude else
+        URLPattern(pattern.pattern, async_reads(pattern.callback),
+                   pattern.default_args, pattern.name)
+        for pattern in patterns
+    ]
@@ -0,0 +1,49 @@
+"""
+Registry and helpers for the scenarios run by `manage.py benchmark`.
+
+Apps declare scenarios in a `benchmarks` module using `register`; each
+scenario seeds its own data inside `rolled_back()` so it can be pointed
+at a real database without leaving anything behind.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+registry = {}
+
+
+def register(name):
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def measure(func, repeat=5):
+    """Return (best wall time in ms, query count) for calling `func`."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(ctx.captured_queries)
+    return min(timings), queries
@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import override_settings
+from django.urls import path
+
+from core import db
+from core.async_views import (
+    async_reads,
+    close_connections,
+    close_request_connections,
+)
+from core.benchmark import register
+
+# Stands in for the one short query of a typical cached API request.
+QUERY = 'SELECT id FROM core_recipe WHERE user_id = %s ORDER BY id DESC ' \
+        'LIMIT 50'
+
+
+def _per_request(connection):
+    connection.ensure_connection()
+    _query(connection)
+    connection.close()
+
+
+def _persistent(connection):
+    _query(connection)
+
+
+def _checked(connection):
+    db.check_health(connection)
+    _query(connection)
+
+
+def _query(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(QUERY, [0])
+        cursor.fetchall()
+
+
+@register('connections')
+def connection_reuse(stdout, scale=1):
+    """Serve requests on a new connection each, or on a kept one.
+
+    Runs on its own connection, outside any test or benchmark
+    transaction, the way a worker's requests do.
+    """
+    requests = 100 * scale
+    modes = [
+        ('new', _per_request),
+        ('persistent', _persistent),
+        ('checked', _checked),
+    ]
+    stdout.write(f'{"mode":>10} {"ms/req":>10} {"req/s":>10} '
+                 f'{"opened":>8}')
+    connection = connections.create_connection('default')
+    try:
+        for name, serve in modes:
+            connection.close()
+            opened = db.connection_stats()['opened']
+            start = time.perf_counter()
+            for _ in range(requests):
+                serve(connection)
+            ms = (time.perf_counter() - start) * 1000 / requests
+            opened = db.connection_stats()['opened'] - opened
+            stdout.write(f'{name:>10} {ms:>10.3f} {1000 / ms:>10.0f} '
+                         f'{opened:>8}')
+    finally:
+        connection.close()
+    stdout.write(f'worker: {db.connection_stats()}')
+
+
+# Seconds each simulated request spends waiting on the database.
+IO_WAIT = 0.01
+
+
+def _io_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_sleep(%s)', [IO_WAIT])
+    return HttpResponse()
+
+
+# URLconf the 'async' scenario serves through the ASGI handler.
+urlpatterns = [
+    path('sync/', _io_view),
+    path('pooled/', async_reads(_io_view)),
+]
+
+
+async def _get(application, url):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': url,
+        'raw_path': url.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    if messages[0]['status'] != 200:
+        raise RuntimeError(f'GET {url} returned {messages[0]["status"]}')
+
+
+async def _serve(application, url, requests, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            await _get(application, url)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+
+
+@register('async')
+def async_concurrency(stdout, scale=1):
+    """Serve I/O-bound requests through one ASGI process at rising load.
+
+    Both views go through get_asgi_application(). 'sync' is a plain
+    sync view, which Django 4.0 runs on a new thread per request;
+    'pooled' is the same view wrapped in core.async_views.async_reads.
+    """
+    requests = 64 * scale
+    views = ['sync', 'pooled']
+    stdout.write(f'{"in flight":>10} ' + ' '.join(
+        f'{name + " req/s":>14} {name + " conns":>14}' for name in views))
+    application = get_asgi_application()
+    # What app.asgi connects for the deployment.
+    request_finished.connect(close_request_connections)
+    try:
+        with override_settings(ROOT_URLCONF=__name__,
+                               ALLOWED_HOSTS=['testserver']):
+            for concurrency in (1, 4, 16, 64):
+                columns = []
+                for name in views:
+                    opened = db.connection_stats()['opened']
+                    start = time.perf_counter()
+                    asyncio.run(_serve(application, f'/{name}/', requests,
+                                       concurrency))
+                    rate = requests / (time.perf_counter() - start)
+                    opened = db.connection_stats()['opened'] - opened
+                    columns.append(f'{rate:>14.0f} {opened:>14}')
+                stdout.write(f'{concurrency:>10} ' + ' '.join(columns))
+    finally:
+        request_finished.disconnect(close_request_connections)
+        close_connections()
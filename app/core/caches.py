@@ -0,0 +1,18 @@
+"""
+Which caches every server process sees.
+
+State that all processes must agree on (revoked tokens, collection
+versions) can only live in a cache they share. A process-local backend
+such as LocMemCache qualifies only while a single process serves the
+app; scripts/run.sh and run_asgi.sh export SERVER_PROCESSES.
+"""
+from django.conf import settings
+
+
+def shared_across_processes(alias):
+    """Whether cache `alias` is the same for every server process."""
+    if not alias:
+        return False
+    backend = settings.CACHES[alias]['BACKEND']
+    return (backend not in settings.PROCESS_LOCAL_CACHE_BACKENDS or
+            settings.SERVER_PROCESSES <= 1)
@@ -0,0 +1,60 @@
+"""
+Health checks and counters for persistent database connections.
+
+With CONN_MAX_AGE each worker keeps its connection between requests.
+Django 4.0 only tests a kept connection after a query failed on it, so
+a connection the server or PgBouncer dropped while the worker was idle
+would fail the next request. `check_connections` runs when a request
+starts and, for connections with CONN_HEALTH_CHECKS, pings each kept
+connection first and replaces it if it is gone, as Django 4.1 does.
+"""
+import os
+import threading
+from collections import Counter
+
+from django.db import connections
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def connection_stats():
+    """Connection counters of this worker process."""
+    with _stats_lock:
+        stats = {event: _stats[event]
+                 for event in ('opened', 'reused', 'unusable')}
+    checked_out = stats['opened'] + stats['reused']
+    stats['reuse_rate'] = stats['reused'] / checked_out if checked_out \
+        else 0.0
+    stats['pid'] = os.getpid()
+    return stats
+
+
+def count_opened():
+    _count('opened')
+
+
+def check_health(connection):
+    """Close `connection` if it is kept open but no longer usable.
+
+    Returns whether an open connection is being reused.
+    """
+    if connection.connection is None or connection.in_atomic_block:
+        return False
+    if connection.settings_dict.get('CONN_HEALTH_CHECKS') and \
+            not connection.is_usable():
+        _count('unusable')
+        connection.close()
+        return False
+    _count('reused')
+    return True
+
+
+def check_connections():
+    for connection in connections.all():
+        check_health(connection)
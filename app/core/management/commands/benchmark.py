@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import autodiscover_modules
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Run registered performance scenarios and print their results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*')
+        parser.add_argument('--scale', type=int, default=1)
+
+    def handle(self, *args, **options):
+        autodiscover_modules('benchmarks')
+        names = options['scenarios'] or sorted(benchmark.registry)
+        for name in names:
+            if name not in benchmark.registry:
+                raise CommandError(f'Unknown scenario: {name}')
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            benchmark.registry[name](self.stdout, scale=options['scale'])
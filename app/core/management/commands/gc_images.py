@@ -0,0 +1,84 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from core.storage import TMP_DIR, recipe_image_storage
+
+
+def referenced_names():
+    """Every stored name some recipe uses as image or rendition."""
+    names = set()
+    rows = Recipe.objects.exclude(image='').exclude(
+        image__isnull=True).values_list('image', 'image_renditions')
+    for image, renditions in rows.iterator():
+        names.add(image)
+        for formats in renditions.values():
+            names.update(formats.values())
+    return names
+
+
+# Where recipe images and abandoned temporary uploads end up.
+IMAGE_DIRS = ['uploads/recipe', TMP_DIR]
+
+
+def stored_names(directory):
+    try:
+        directories, files = recipe_image_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from stored_names(posixpath.join(directory, subdirectory))
+
+
+class Command(BaseCommand):
+    """Mark and sweep over the stored recipe images.
+
+    Rather than keeping a reference count per file, every name in use is
+    collected from the recipes and older files outside that set are
+    deleted. Files have no row until the request storing them commits,
+    so a file whose upload is still uncommitted after --grace seconds
+    is deleted too and the recipe then points at a missing image.
+    """
+    help = ('Delete recipe image files that no recipe references. This is '
+            'a mark and sweep, not a reference count: a file whose upload '
+            'has not committed within --grace seconds is deleted as well')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Keep files younger than this many seconds; uploads in '
+                 'flight are not referenced yet, so this must exceed the '
+                 'longest upload request')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        # Listed first: files stored after the scan started are skipped.
+        candidates = [
+            name for directory in IMAGE_DIRS
+            for name in stored_names(directory)
+            if recipe_image_storage.get_modified_time(name) < cutoff
+        ]
+        referenced = referenced_names()
+        removed = size = 0
+        for name in candidates:
+            if name in referenced:
+                continue
+            try:
+                # Re-check: the blob may have been uploaded again since.
+                if recipe_image_storage.get_modified_time(name) >= cutoff:
+                    continue
+                size += recipe_image_storage.size(name)
+                if not options['dry_run']:
+                    recipe_image_storage.delete(name)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            self.stdout.write(name)
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(f'{verb} {removed} files, {size} bytes')
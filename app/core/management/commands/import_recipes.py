@@ -0,0 +1,48 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importers import (
+    FORMATS,
+    guess_format,
+    import_recipes,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    help = 'Import recipes for a user from an NDJSON or CSV dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the recipes')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+        file_format = options['format'] or guess_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot guess the format, pass --format')
+
+        def progress(report):
+            self.stdout.write(
+                f'{report.created} imported, {report.failed} failed')
+            for error in report.errors:
+                self.stderr.write(json.dumps(error))
+            report.errors.clear()
+
+        with open(options['path'], 'rb') as fileobj:
+            report = import_recipes(
+                user,
+                read_records(fileobj, file_format),
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {report.created} imported, {report.failed} failed'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ImageStatus, Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    help = ('Render recipe images left pending (e.g. by a restart) '
+            'or, with --failed, retry failed ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true')
+
+    def handle(self, *args, **options):
+        statuses = [ImageStatus.PENDING]
+        if options['failed']:
+            statuses.append(ImageStatus.FAILED)
+        ids = Recipe.objects.filter(image_status__in=statuses).values_list(
+            'id', flat=True)
+        count = 0
+        for count, recipe_id in enumerate(ids.iterator(), 1):
+            images.process(recipe_id)
+        self.stdout.write(f'{count} images processed')
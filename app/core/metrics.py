@@ -0,0 +1,411 @@
+"""
+Per-view request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware (core.middleware) times each request. It also
+times the database queries the request runs, through
+connection.execute_wrapper, and the serialization of its DRF response:
+building `serializer.data` (TimedDataMixin on the serializers, which
+includes the queries lazy relations run) and rendering it to JSON
+(TimedJSONRenderer). The timings go into a Server-Timing header
+and are aggregated into per-view histograms, which `metrics_view`
+serves at /metrics.
+
+Metrics are kept in the process that served the request. With
+METRICS_DIR set (scripts/run.sh and run_asgi.sh do), each process also
+writes a snapshot of them there every METRICS_FLUSH_INTERVAL seconds,
+and /metrics sums the snapshots of every worker, so a scrape sees the
+whole server whichever worker answers it. Snapshots of exited workers
+are folded into one archive file, keeping the counters monotonic.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+
+from core import db
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                    10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Wall time of requests.', DURATION_BUCKETS),
+    'http_request_db_seconds': (
+        'Time requests spent in database queries.', DURATION_BUCKETS),
+    'http_request_db_queries': (
+        'Database queries run per request.', QUERY_BUCKETS),
+    'http_request_serialize_seconds': (
+        'Time requests spent building and rendering serializer data.',
+        DURATION_BUCKETS),
+    'http_response_size_bytes': (
+        'Size of response bodies; streamed ones are not counted.',
+        SIZE_BUCKETS),
+}
+
+CONNECTION_COUNTERS = {
+    'opened': 'Database connections opened.',
+    'reused': 'Requests served on a kept database connection.',
+    'unusable': 'Kept database connections found broken and replaced.',
+}
+
+# Counter name: (description, function returning this process's count).
+COUNTERS = {}
+
+ARCHIVE = 'archive.json'
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class RequestTimings:
+    """What the current request has spent so far, in seconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+    def server_timing(self, total):
+        return (f'db;dur={self.db * 1000:.1f};desc="{self.queries} '
+                f'queries", serialize;dur={self.serialize * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}')
+
+
+current = ContextVar('request_timings', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += perf_counter() - start
+        timings.queries += 1
+
+
+@contextmanager
+def timed_queries():
+    """Count queries on this thread's connections into `current`."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_record_query))
+        yield
+
+
+def _add_serialize(start):
+    timings = current.get()
+    if timings is not None:
+        timings.serialize += perf_counter() - start
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = perf_counter()
+        try:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        finally:
+            _add_serialize(start)
+
+
+class TimedDataMixin:
+    """Serializer mixin counting `data` (to_representation) as serialize.
+
+    For `many=True`, set Meta.list_serializer_class to TimedListSerializer
+    or a list serializer with this mixin. Nested serializers need
+    nothing; the `data` of the outermost one covers them.
+    """
+
+    @property
+    def data(self):
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            _add_serialize(start)
+
+
+class TimedListSerializer(TimedDataMixin, ListSerializer):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One more slot for values above the last bucket (+Inf).
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """(le, cumulative count) pairs, +Inf last."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+_lock = threading.Lock()
+_histograms = {}
+_requests = {}
+_pid = None
+_snapshot_name = None
+_version = 0
+_flushed_version = 0
+
+
+def reset():
+    global _version
+    with _lock:
+        _histograms.clear()
+        _requests.clear()
+        _version += 1
+
+
+def _check_process():
+    """Start afresh in a forked process; call with `_lock` held."""
+    global _pid, _snapshot_name, _version, _flushed_version
+    if _pid == os.getpid():
+        return
+    _pid = os.getpid()
+    _snapshot_name = f'{_pid}-{time.time_ns()}.json'
+    _histograms.clear()
+    _requests.clear()
+    _version = _flushed_version = 0
+    if settings.METRICS_DIR:
+        threading.Thread(target=_flush_periodically, daemon=True,
+                         name='metrics-flush').start()
+        atexit.register(flush)
+
+
+def observe(view, method, status, duration, timings, size=None):
+    """Add one finished request to the metrics of `view`."""
+    global _version
+    method = method if method in METHODS else 'OTHER'
+    values = {
+        'http_request_duration_seconds': duration,
+        'http_request_db_seconds': timings.db,
+        'http_request_db_queries': timings.queries,
+        'http_request_serialize_seconds': timings.serialize,
+        'http_response_size_bytes': size,
+    }
+    with _lock:
+        _check_process()
+        for name, value in values.items():
+            if value is None:
+                continue
+            key = (name, view, method)
+            if key not in _histograms:
+                _histograms[key] = Histogram(HISTOGRAMS[name][1])
+            _histograms[key].observe(value)
+        key = (view, method, str(status))
+        _requests[key] = _requests.get(key, 0) + 1
+        _version += 1
+
+
+def register_counter(name, description, read):
+    """Report `read()`, a count kept by this process, as counter `name`.
+
+    Counts are added up across processes like the rest of the metrics.
+    """
+    COUNTERS[name] = (description, read)
+
+
+for _event, _description in CONNECTION_COUNTERS.items():
+    register_counter(f'db_connections_{_event}_total', _description,
+                     lambda event=_event: db.connection_stats()[event])
+
+
+def _counters():
+    return {name: read() for name, (_description, read) in COUNTERS.items()}
+
+
+def _snapshot():
+    """This process's metrics as JSON-compatible data, and its version."""
+    with _lock:
+        _check_process()
+        snapshot = {
+            'requests': [[*key, count] for key, count in _requests.items()],
+            'histograms': [[*key, histogram.counts, histogram.sum]
+                           for key, histogram in _histograms.items()],
+            'counters': _counters(),
+        }
+        return snapshot, _version
+
+
+def _merge(snapshots):
+    """Sum `snapshots` into one."""
+    requests = {}
+    histograms = {}
+    counters = {}
+    for snapshot in snapshots:
+        for *key, count in snapshot['requests']:
+            key = tuple(key)
+            requests[key] = requests.get(key, 0) + count
+        for name, view, method, counts, total in snapshot['histograms']:
+            key = (name, view, method)
+            if key in histograms:
+                merged, merged_total = histograms[key]
+                counts = [a + b for a, b in zip(merged, counts)]
+                total += merged_total
+            histograms[key] = (counts, total)
+        for name, value in snapshot['counters'].items():
+            counters[name] = counters.get(name, 0) + value
+    return {
+        'requests': [[*key, count] for key, count in requests.items()],
+        'histograms': [[*key, counts, total]
+                       for key, (counts, total) in histograms.items()],
+        'counters': counters,
+    }
+
+
+def _path(name):
+    return os.path.join(settings.METRICS_DIR, name)
+
+
+def _read(name):
+    with open(_path(name)) as snapshot_file:
+        return json.load(snapshot_file)
+
+
+def _write(name, snapshot):
+    temporary = _path(f'.{name}.{threading.get_ident()}.tmp')
+    with open(temporary, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary, _path(name))
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR if it changed."""
+    global _flushed_version
+    if not settings.METRICS_DIR:
+        return
+    snapshot, version = _snapshot()
+    if version == _flushed_version and \
+            os.path.exists(_path(_snapshot_name)):
+        return
+    _write(_snapshot_name, snapshot)
+    _flushed_version = version
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect():
+    """Merged snapshots of every process sharing METRICS_DIR.
+
+    Snapshots of exited processes are folded into the archive. It names
+    the files it took in, so ones left behind by a crash between writing
+    it and deleting them are not counted twice.
+    """
+    flush()
+    with open(_path('.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        names = [name for name in os.listdir(settings.METRICS_DIR)
+                 if name.endswith('.json') and name != ARCHIVE]
+        try:
+            archive = _read(ARCHIVE)
+        except FileNotFoundError:
+            archive = dict(_merge([]), merged=[])
+        for name in set(archive['merged']).intersection(names):
+            os.remove(_path(name))
+            names.remove(name)
+
+        snapshots = {}
+        for name in names:
+            try:
+                snapshots[name] = _read(name)
+            except (OSError, ValueError):
+                continue
+        exited = [name for name in snapshots
+                  if not _alive(int(name.split('-', 1)[0]))]
+        if exited:
+            archive = dict(
+                _merge([archive] + [snapshots.pop(name) for name in exited]),
+                merged=exited)
+            _write(ARCHIVE, archive)
+            for name in exited:
+                os.remove(_path(name))
+    return _merge([archive, *snapshots.values()])
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"'
+                          for name, value in labels.items()) + '}'
+
+
+def render():
+    """Every metric of the server in the Prometheus text format.
+
+    Without METRICS_DIR, only those of this process.
+    """
+    if settings.METRICS_DIR:
+        snapshot = _collect()
+    else:
+        snapshot, _ = _snapshot()
+    lines = [
+        '# HELP http_requests_total Requests served.',
+        '# TYPE http_requests_total counter',
+    ]
+    for view, method, status, count in sorted(snapshot['requests']):
+        lines.append('http_requests_total' + _labels(
+            view=view, method=method, status=status) + f' {count}')
+    histograms = sorted(snapshot['histograms'])
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}',
+                  f'# TYPE {name} histogram']
+        for metric, view, method, counts, total in histograms:
+            if metric != name:
+                continue
+            histogram = Histogram(buckets)
+            histogram.counts = counts
+            histogram.sum = total
+            for bound, count in histogram.samples():
+                lines.append(f'{name}_bucket' + _labels(
+                    view=view, method=method, le=bound) + f' {count}')
+            labels = _labels(view=view, method=method)
+            lines += [f'{name}_sum{labels} {total}',
+                      f'{name}_count{labels} {sum(counts)}']
+    counters = snapshot['counters']
+    for name, (description, _read) in COUNTERS.items():
+        lines += [f'# HELP {name} {description}',
+                  f'# TYPE {name} counter',
+                  f'{name} {counters.get(name, 0)}']
+    return '\n'.join(lines) + '\n'
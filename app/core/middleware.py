@@ -0,0 +1,64 @@
+import logging
+import random
+from time import perf_counter
+
+from django.conf import settings
+
+from core import metrics, queries
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Time each request for the Server-Timing header and /metrics.
+
+    Keep it first in MIDDLEWARE so the timings cover all the others.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = metrics.RequestTimings()
+        token = metrics.current.set(timings)
+        start = perf_counter()
+        try:
+            with metrics.timed_queries():
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        duration = perf_counter() - start
+
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match else '<unmatched>',
+            request.method,
+            response.status_code,
+            duration,
+            timings,
+            None if response.streaming else len(response.content),
+        )
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(duration)
+        return response
+
+
+class QueryReportMiddleware:
+    """Log repeated and slow queries of a sample of requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.QUERY_REPORT_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = queries.QueryRecorder(
+            slow=settings.QUERY_REPORT_SLOW_MS / 1000)
+        with queries.recording(recorder):
+            response = self.get_response(request)
+        report = recorder.report(
+            max_repeats=settings.QUERY_REPORT_MAX_REPEATS)
+        if report:
+            logger.warning('Queries of %s %s:\n%s', request.method,
+                           request.path, report)
+        return response
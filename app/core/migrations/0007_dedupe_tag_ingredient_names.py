@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold rows sharing (user, name) into the oldest one.
+
+    Needed before (user, name) can be made unique: recipes pointing at a
+    duplicate are re-pointed at the surviving row.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'),
+                                 ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        fk = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'), count=Count('id')).filter(count__gt=1)
+        for duplicate in duplicates:
+            ids = list(model.objects.filter(
+                user=duplicate['user'], name=duplicate['name']
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+            recipe_ids = through.objects.filter(
+                **{f'{fk}__in': ids}).values_list('recipe_id', flat=True)
+            through.objects.bulk_create(
+                [through(recipe_id=recipe_id, **{fk: duplicate['keep']})
+                 for recipe_id in set(recipe_ids)],
+                ignore_conflicts=True
+            )
+            model.objects.filter(id__in=ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def unique_concurrently(table, name):
+    """Build the unique index without locking writes, then attach it."""
+    return [
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+        f'ON "{table}" ("user_id", "name")',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" '
+        f'UNIQUE USING INDEX "{name}"',
+    ]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_dedupe_tag_ingredient_names'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'],
+                               name='recipe_user_id_desc_idx'),
+        ),
+        migrations.RunSQL(
+            sql=unique_concurrently('core_tag', 'unique_tag_user_name'),
+            reverse_sql='ALTER TABLE "core_tag" '
+                        'DROP CONSTRAINT "unique_tag_user_name"',
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='tag',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'name'),
+                        name='unique_tag_user_name'),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=unique_concurrently('core_ingredient',
+                                    'unique_ingredient_user_name'),
+            reverse_sql='ALTER TABLE "core_ingredient" '
+                        'DROP CONSTRAINT "unique_ingredient_user_name"',
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='ingredient',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'name'),
+                        name='unique_ingredient_user_name'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.10 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    """Mark uploaded images pending so `process_images` renders them."""
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image='').exclude(image__isnull=True).update(
+        image_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'None'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=10),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
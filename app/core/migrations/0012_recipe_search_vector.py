@@ -0,0 +1,155 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+# The search document of a recipe: title (A), tag and ingredient names
+# (B) and description (C). Triggers keep core_recipe.search_vector in
+# step with every write path, including bulk inserts and raw updates.
+SEARCH_FUNCTIONS = """
+CREATE FUNCTION core_recipe_search_vector(
+    recipe_id bigint, title text, description text
+) RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_recipe_tags rt
+            JOIN core_tag t ON t.id = rt.tag_id
+            WHERE rt.recipe_id = $1), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(i.name, ' ') FROM core_recipe_ingredients ri
+            JOIN core_ingredient i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = $1), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+$$;
+
+CREATE FUNCTION core_recipe_search_row() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        -- No tags or ingredients can point at a new row yet.
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english',
+                                  coalesce(NEW.description, '')), 'C');
+    ELSE
+        NEW.search_vector := core_recipe_search_vector(
+            NEW.id, NEW.title, NEW.description);
+    END IF;
+    RETURN NEW;
+END $$;
+
+CREATE FUNCTION core_recipe_search_relations() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_recipe r SET search_vector =
+            core_recipe_search_vector(r.id, r.title, r.description)
+        WHERE r.id IN (SELECT recipe_id FROM changed_new);
+    ELSE
+        UPDATE core_recipe r SET search_vector =
+            core_recipe_search_vector(r.id, r.title, r.description)
+        WHERE r.id IN (SELECT recipe_id FROM changed_old);
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION core_recipe_search_rename() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format(
+        'UPDATE core_recipe r SET search_vector = '
+        'core_recipe_search_vector(r.id, r.title, r.description) '
+        'WHERE r.id IN (SELECT recipe_id FROM %I WHERE %I = $1)',
+        TG_ARGV[0], TG_ARGV[1]
+    ) USING NEW.id;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER core_recipe_search_row
+BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+FOR EACH ROW EXECUTE FUNCTION core_recipe_search_row();
+
+CREATE TRIGGER core_recipe_tags_search_insert
+AFTER INSERT ON core_recipe_tags REFERENCING NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_relations();
+CREATE TRIGGER core_recipe_tags_search_delete
+AFTER DELETE ON core_recipe_tags REFERENCING OLD TABLE AS changed_old
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_relations();
+CREATE TRIGGER core_recipe_ingredients_search_insert
+AFTER INSERT ON core_recipe_ingredients
+REFERENCING NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_relations();
+CREATE TRIGGER core_recipe_ingredients_search_delete
+AFTER DELETE ON core_recipe_ingredients
+REFERENCING OLD TABLE AS changed_old
+FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_relations();
+
+CREATE TRIGGER core_tag_search_rename
+AFTER UPDATE OF name ON core_tag
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION core_recipe_search_rename('core_recipe_tags', 'tag_id');
+CREATE TRIGGER core_ingredient_search_rename
+AFTER UPDATE OF name ON core_ingredient
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION core_recipe_search_rename(
+    'core_recipe_ingredients', 'ingredient_id');
+"""
+
+DROP_SEARCH_FUNCTIONS = """
+DROP TRIGGER core_ingredient_search_rename ON core_ingredient;
+DROP TRIGGER core_tag_search_rename ON core_tag;
+DROP TRIGGER core_recipe_ingredients_search_delete
+    ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_search_insert
+    ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_search_delete ON core_recipe_tags;
+DROP TRIGGER core_recipe_tags_search_insert ON core_recipe_tags;
+DROP TRIGGER core_recipe_search_row ON core_recipe;
+DROP FUNCTION core_recipe_search_rename();
+DROP FUNCTION core_recipe_search_relations();
+DROP FUNCTION core_recipe_search_row();
+DROP FUNCTION core_recipe_search_vector(bigint, text, text);
+"""
+
+BATCH_SIZE = 10000
+
+
+def backfill(apps, schema_editor):
+    """Fill existing rows in id batches, each its own transaction."""
+    Recipe = apps.get_model('core', 'Recipe')
+    last = Recipe.objects.order_by('-id').values_list('id', flat=True)
+    last = last.first() or 0
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last + 1, BATCH_SIZE):
+            cursor.execute(
+                'UPDATE core_recipe SET search_vector = '
+                'core_recipe_search_vector(id, title, description) '
+                'WHERE id >= %s AND id < %s',
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_FUNCTIONS, DROP_SEARCH_FUNCTIONS),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
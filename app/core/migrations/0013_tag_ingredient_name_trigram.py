@@ -0,0 +1,68 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ('core_tag', 'tag_name_trgm_idx'),
+    ('core_ingredient', 'ingredient_name_trgm_idx'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index UPPER(name) for LIKE and similarity searches.
+
+    Skipped where the pg_trgm extension is not available; autocomplete
+    then falls back to unindexed prefix/substring matching.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions "
+                       "WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, name in TRIGRAM_INDEXES:
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+                f'ON "{table}" USING gin (UPPER("name") gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, name in TRIGRAM_INDEXES:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_trigram_indexes,
+                                     drop_trigram_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='tag',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            django.db.models.functions.text.Upper('name'),
+                            name='gin_trgm_ops'),
+                        name='tag_name_trgm_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            django.db.models.functions.text.Upper('name'),
+                            name='gin_trgm_ops'),
+                        name='ingredient_name_trgm_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_tag_ingredient_name_trigram'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', 'id'],
+                               name='recipe_user_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', 'id'],
+                               name='recipe_user_price_idx'),
+        ),
+    ]
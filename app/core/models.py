@@ -1,7 +1,10 @@
 import uuid
 import os
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import (
      AbstractBaseUser,
      BaseUserManager,
@@ -9,6 +12,8 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.storage import recipe_image_storage
+
 
 def recipe_image_file_path(instance, filename):
     ext = os.path.splitext(filename)[1]
@@ -46,6 +51,19 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
 
 
+class RecipeManager(models.Manager):
+    def get_queryset(self):
+        # The search document is only ever read inside the database.
+        return super().get_queryset().defer('search_vector')
+
+
+class ImageStatus(models.TextChoices):
+    NONE = 'none'
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
 class Recipe(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -58,7 +76,28 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path,
+                              storage=recipe_image_storage)
+    image_status = models.CharField(
+        max_length=10, choices=ImageStatus.choices, default=ImageStatus.NONE)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by database triggers (migration 0012), never by Django.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'],
+                         name='recipe_user_id_desc_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recipe_user_price_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -71,6 +110,17 @@ class Tag(models.Model):
     )
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='unique_tag_user_name'),
+        ]
+        indexes = [
+            # Only created where pg_trgm is available (migration 0013).
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='tag_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -83,5 +133,16 @@ class Ingredient (models.Model):
     )
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='unique_ingredient_user_name'),
+        ]
+        indexes = [
+            # Only created where pg_trgm is available (migration 0013).
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='ingredient_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
@@ -0,0 +1,176 @@
+"""
+Query budgets: catch N+1 queries in tests and report them in staging.
+
+Queries are grouped by fingerprint, which is their SQL with IN lists,
+multi-row VALUES and savepoint names collapsed. The same fingerprint
+run again and again in one request is the signature of a per-row
+lookup.
+
+`query_budget` is a context manager or decorator for tests. It fails
+the block when it runs more than `max_queries` queries, or runs one
+fingerprint more than `max_repeats` times. QueryReportMiddleware records
+a QUERY_REPORT_SAMPLE_RATE share of live requests the same way (see
+core.middleware). It logs
+repeated and slow queries together with the project code that ran them.
+"""
+import re
+import traceback
+from contextlib import ContextDecorator, ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+STACK_DEPTH = 6
+
+_FINGERPRINT_RULES = [
+    (re.compile(r'IN \(%s(?:, %s)*\)'), 'IN (...)'),
+    (re.compile(r'VALUES (\([^)]*\))(?:, \([^)]*\))+'), r'VALUES \1, ...'),
+    (re.compile(r'"s\w+_x\d+"'), '"savepoint"'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql):
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def _project_stack():
+    """The innermost project frames of the current stack."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir) and
+        frame.filename != __file__
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+def _format_stack(frames):
+    base_dir = str(settings.BASE_DIR)
+    return [f'    {frame.filename[len(base_dir) + 1:]}:{frame.lineno} '
+            f'in {frame.name}' for frame in reversed(frames)]
+
+
+class QueryStats:
+    def __init__(self, stack):
+        self.count = 0
+        self.time = 0.0
+        # Where the fingerprint was first run; repeats come from there.
+        self.stack = stack
+
+
+class QueryRecorder:
+    """Queries run while recording, by fingerprint."""
+
+    def __init__(self, slow=None):
+        self.slow = slow
+        self.count = 0
+        self.time = 0.0
+        self.fingerprints = {}
+        self.slow_queries = []
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.time += duration
+        key = fingerprint(sql)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            stats = self.fingerprints[key] = QueryStats(_project_stack())
+        stats.count += 1
+        stats.time += duration
+        if self.slow is not None and duration >= self.slow:
+            self.slow_queries.append((duration, key, _project_stack()))
+
+    def repeated(self, max_repeats):
+        """(fingerprint, stats) run more than `max_repeats` times."""
+        return sorted(
+            ((key, stats) for key, stats in self.fingerprints.items()
+             if stats.count > max_repeats),
+            key=lambda item: -item[1].count,
+        )
+
+    def report(self, max_queries=None, max_repeats=None):
+        """What broke the given limits, or '' if nothing did."""
+        lines = []
+        if max_queries is not None and self.count > max_queries:
+            lines.append(f'{self.count} queries, more than the '
+                         f'{max_queries} allowed')
+        if max_repeats is not None:
+            for key, stats in self.repeated(max_repeats):
+                lines.append(f'{stats.count}x ({stats.time * 1000:.1f} ms) '
+                             f'{key}')
+                lines += _format_stack(stats.stack)
+        for duration, key, stack in self.slow_queries:
+            lines.append(f'slow ({duration * 1000:.1f} ms) {key}')
+            lines += _format_stack(stack)
+        if not lines:
+            return ''
+        return '\n'.join([f'{self.count} queries in '
+                          f'{self.time * 1000:.1f} ms'] + lines)
+
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, perf_counter() - start)
+
+
+@contextmanager
+def recorded_queries():
+    """Feed queries on this thread's connections to the active recorder."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_record_query))
+        yield
+
+
+@contextmanager
+def recording(recorder):
+    token = _recorder.set(recorder)
+    try:
+        with recorded_queries():
+            yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """Fail when the block runs too many or too repetitive queries.
+
+        with query_budget(max_queries=3, max_repeats=1):
+            self.client.get(RECIPE_URL)
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+
+    def __enter__(self):
+        self.recorder = QueryRecorder()
+        self._recording = recording(self.recorder)
+        return self._recording.__enter__()
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self._recording.__exit__(exc_type, exc_value, exc_tb)
+        if exc_type is not None:
+            return False
+        report = self.recorder.report(self.max_queries, self.max_repeats)
+        if report:
+            raise QueryBudgetExceeded(f'Query budget exceeded: {report}')
+        return False
@@ -0,0 +1,17 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import db
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    db.count_opened()
+
+
+# Connected after django.db's own handler, which already closed the
+# connections past CONN_MAX_AGE.
+@receiver(request_started)
+def check_connections_on_request(sender, **kwargs):
+    db.check_connections()
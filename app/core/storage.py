@@ -0,0 +1,84 @@
+"""
+Content-addressed file storage for recipe images.
+
+Files are stored under the SHA-256 of their content, computed while the
+upload is streamed to a temporary file, so identical uploads share one
+blob. Uploads that arrive already hashed on disk (a `sha256` attribute
+next to `temporary_file_path`, see recipe.uploads) are moved into place
+without being read again. Only the directory and extension of the
+requested name are kept. Blobs are shared between recipes and never
+deleted on replacement; the `gc_images` command removes the ones no
+recipe references any more.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+TMP_DIR = 'tmp'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Any name will do: _save replaces it with the content hash.
+        return name
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            name = self.blob_name(name, digest)
+            self._store(content.temporary_file_path(), name, move=True)
+            # Its file is gone; closing now saves a warning at collection.
+            content.close()
+            return name
+
+        tmp_dir = self.path(TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            name = self.blob_name(name, digest.hexdigest())
+            self._store(tmp_path, name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return name
+
+    def _store(self, path, name, move=False):
+        """Put the file at `path` in place as blob `name` if missing."""
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            # Already stored: refresh its age so gc_images keeps it.
+            os.utime(full_path)
+            return
+        except FileNotFoundError:
+            pass
+        if move:
+            # The upload may live on another file system.
+            file_move_safe(path, full_path, allow_overwrite=True)
+        else:
+            os.replace(path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    @staticmethod
+    def blob_name(name, digest):
+        directory = posixpath.dirname(name)
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], f'{digest}{ext}')
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import path
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.async_views import async_read_urls, async_reads, close_connections
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+
+
+def _thread_view(request):
+    return HttpResponse(threading.current_thread().name)
+
+
+class AsyncReadsTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(close_connections)
+        self.view = async_to_sync(async_reads(_thread_view))
+
+    def test_reads_run_on_pool(self):
+        for method in ('get', 'head'):
+            request = getattr(RequestFactory(), method)('/')
+
+            res = self.view(request)
+
+            self.assertTrue(res.content.decode().startswith('async-db'))
+
+    def test_writes_run_on_shared_thread(self):
+        res = self.view(RequestFactory().post('/'))
+
+        self.assertFalse(res.content.decode().startswith('async-db'))
+
+    def test_async_read_urls(self):
+        patterns = [path('a/', _thread_view, name='a'),
+                    path('b/', _thread_view, name='b')]
+
+        with override_settings(ASYNC_READ_VIEWS=False):
+            self.assertEqual(async_read_urls(patterns), patterns)
+        with override_settings(ASYNC_READ_VIEWS=True):
+            wrapped = async_read_urls(patterns, exclude=['b'])
+
+        self.assertTrue(asyncio.iscoroutinefunction(wrapped[0].callback))
+        self.assertEqual(wrapped[0].name, 'a')
+        self.assertIs(wrapped[1], patterns[1])
+
+
+class AsyncRecipeViewTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(close_connections)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=20,
+            price=Decimal('4.50'))
+
+    def test_list_and_retrieve(self):
+        factory = APIRequestFactory()
+        list_view = async_to_sync(async_reads(
+            RecipeViewSet.as_view({'get': 'list'})))
+        detail_view = async_to_sync(async_reads(
+            RecipeViewSet.as_view({'get': 'retrieve'})))
+        list_request = factory.get('/api/recipe/recipes/')
+        detail_request = factory.get('/api/recipe/recipes/1/')
+        force_authenticate(list_request, self.user)
+        force_authenticate(detail_request, self.user)
+
+        listed = list_view(list_request)
+        detail = detail_view(detail_request, pk=self.recipe.pk)
+
+        self.assertTrue(listed.is_rendered)
+        self.assertEqual([r['title'] for r in listed.data['results']],
+                         ['Curry'])
+        self.assertEqual(detail.data['price'], '4.50')
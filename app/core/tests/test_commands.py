@@ -1,10 +1,20 @@
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
+from PIL import Image
 from psycopg2 import OperationalError as Psycopg2opError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import ImageStatus, Recipe
+from core.storage import recipe_image_storage
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -21,3 +31,111 @@ class CommandTests(SimpleTestCase):
         call_command('wait_for_db')
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_m2m_update(self):
+        out = StringIO()
+        call_command('benchmark', 'm2m_update', stdout=out)
+
+        self.assertIn('m2m_update', out.getvalue())
+
+    def test_benchmark_auth(self):
+        out = StringIO()
+        call_command('benchmark', 'auth', stdout=out)
+
+        self.assertIn('signed', out.getvalue())
+
+    def test_benchmark_connections(self):
+        out = StringIO()
+        call_command('benchmark', 'connections', stdout=out)
+
+        self.assertIn('persistent', out.getvalue())
+
+    def test_benchmark_async(self):
+        out = StringIO()
+        call_command('benchmark', 'async', stdout=out)
+
+        self.assertIn('pooled', out.getvalue())
+
+    def test_benchmark_unknown_scenario(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark', 'missing', stdout=StringIO())
+
+
+class ImportRecipesCommandTests(TestCase):
+    def test_import_recipes(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'testpass123')
+        out = StringIO()
+        err = StringIO()
+        with tempfile.NamedTemporaryFile(suffix='.csv') as dump:
+            dump.write(b'title,time_minutes,price,tags\n'
+                       b'Tacos,20,3.00,Dinner\n'
+                       b'Broken,,3.00,\n')
+            dump.flush()
+            call_command('import_recipes', dump.name, user=user.email,
+                         stdout=out, stderr=err)
+
+        self.assertIn('1 imported, 1 failed', out.getvalue())
+        self.assertIn('"line": 3', err.getvalue())
+        self.assertEqual(user.recipe_set.count(), 1)
+
+    def test_import_recipes_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'dump.csv',
+                         user='nobody@example.com')
+
+
+class ImageCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'testpass123')
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def _create_recipe(self, size, **params):
+        buffer = BytesIO()
+        Image.new('RGB', (size, size)).save(buffer, format='JPEG')
+        return Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'),
+            image=SimpleUploadedFile('soup.jpg', buffer.getvalue()),
+            **params)
+
+    def test_process_pending_images(self):
+        recipe = self._create_recipe(10, image_status=ImageStatus.PENDING)
+        out = StringIO()
+
+        call_command('process_images', stdout=out)
+
+        recipe.refresh_from_db()
+        self.assertIn('1 images processed', out.getvalue())
+        self.assertEqual(recipe.image_status, ImageStatus.READY)
+
+    def test_gc_images(self):
+        kept = self._create_recipe(10)
+        replaced = self._create_recipe(20)
+        orphan = replaced.image.name
+        replaced.image = kept.image
+        replaced.save()
+        out = StringIO()
+
+        call_command('gc_images', grace=-60, stdout=out)
+
+        self.assertIn('Removed 1 files', out.getvalue())
+        self.assertFalse(recipe_image_storage.exists(orphan))
+        self.assertTrue(recipe_image_storage.exists(kept.image.name))
+
+    def test_gc_images_keeps_recent_files(self):
+        recipe = self._create_recipe(10)
+        recipe.delete()
+        out = StringIO()
+
+        call_command('gc_images', stdout=out)
+
+        self.assertIn('Removed 0 files', out.getvalue())
+        self.assertTrue(recipe_image_storage.exists(recipe.image.name))
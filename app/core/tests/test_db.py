@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core import db
+
+
+class ConnectionHealthTests(SimpleTestCase):
+    databases = ['default']
+
+    def setUp(self):
+        # A connection of its own, outside the test transaction.
+        self.connection = connections.create_connection('default')
+        self.addCleanup(self.connection.close)
+        # settings_dict is shared with every other connection to default.
+        health_checks = patch.dict(self.connection.settings_dict,
+                                   {'CONN_HEALTH_CHECKS': True})
+        health_checks.start()
+        self.addCleanup(health_checks.stop)
+
+    def test_opened_connections_counted(self):
+        before = db.connection_stats()['opened']
+
+        self.connection.ensure_connection()
+
+        self.assertEqual(db.connection_stats()['opened'], before + 1)
+
+    def test_kept_connection_reused(self):
+        self.connection.ensure_connection()
+        before = db.connection_stats()
+
+        self.assertTrue(db.check_health(self.connection))
+
+        after = db.connection_stats()
+        self.assertEqual(after['reused'], before['reused'] + 1)
+        self.assertIsNotNone(self.connection.connection)
+
+    def test_unusable_connection_closed(self):
+        self.connection.ensure_connection()
+        before = db.connection_stats()['unusable']
+
+        with patch.object(self.connection, 'is_usable', return_value=False):
+            self.assertFalse(db.check_health(self.connection))
+
+        self.assertEqual(db.connection_stats()['unusable'], before + 1)
+        self.assertIsNone(self.connection.connection)
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_health_checks_disabled(self):
+        self.connection.ensure_connection()
+
+        with patch.dict(self.connection.settings_dict,
+                        {'CONN_HEALTH_CHECKS': False}), \
+                patch.object(self.connection, 'is_usable') as is_usable:
+            self.assertTrue(db.check_health(self.connection))
+
+        is_usable.assert_not_called()
+
+    def test_closed_connection_skipped(self):
+        self.assertFalse(db.check_health(self.connection))
+
+    def test_check_connections_checks_each(self):
+        with patch('core.db.check_health') as check_health, \
+                patch('core.db.connections.all',
+                      return_value=[self.connection]):
+            db.check_connections()
+
+        check_health.assert_called_once_with(self.connection)
@@ -0,0 +1,171 @@
+import multiprocessing
+import re
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Tag
+from recipe.serializers import TagSerializer
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class HistogramTests(SimpleTestCase):
+    def test_cumulative_buckets(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(value)
+
+        self.assertEqual(list(histogram.samples()),
+                         [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 11.5)
+
+
+def _observe_in_child():
+    metrics.observe('recipe:tag-list', 'GET', 200, 0.02,
+                    metrics.RequestTimings(), 100)
+    metrics.flush()
+
+
+class SharedMetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        metrics_dir = override_settings(METRICS_DIR=directory.name)
+        metrics_dir.enable()
+        self.addCleanup(metrics_dir.disable)
+
+    def _observe_in_other_process(self):
+        child = multiprocessing.get_context('fork').Process(
+            target=_observe_in_child)
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+
+    def test_processes_added_up_in_one_scrape(self):
+        metrics.observe('recipe:tag-list', 'GET', 200, 0.01,
+                        metrics.RequestTimings(), 100)
+        self._observe_in_other_process()
+
+        body = metrics.render()
+
+        self.assertIn('http_requests_total{view="recipe:tag-list",'
+                      'method="GET",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket'
+                      '{view="recipe:tag-list",method="GET",le="0.01"} 1',
+                      body)
+        self.assertIn('http_request_duration_seconds_count'
+                      '{view="recipe:tag-list",method="GET"} 2', body)
+
+    def test_exited_processes_kept_in_archive(self):
+        self._observe_in_other_process()
+        self._observe_in_other_process()
+        metrics.render()
+
+        body = metrics.render()
+
+        self.assertIn('http_requests_total{view="recipe:tag-list",'
+                      'method="GET",status="200"} 2', body)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_server_timing_header(self):
+        res = self.client.get(TAGS_URL)
+
+        timing = res['Server-Timing']
+        queries = int(re.search(r'desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        self.assertRegex(timing, r'serialize;dur=\d+\.\d, total;dur=')
+
+    def test_server_timing_covers_serializer_data(self):
+        to_representation = TagSerializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.05)
+            return to_representation(serializer, instance)
+
+        with patch.object(TagSerializer, 'to_representation', slow):
+            res = self.client.get(TAGS_URL)
+
+        serialize = re.search(r'serialize;dur=([\d.]+)', res['Server-Timing'])
+        self.assertGreaterEqual(float(serialize.group(1)), 50)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_per_view(self):
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+
+        body = res.content.decode()
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('http_requests_total{view="recipe:tag-list",'
+                      'method="GET",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_count'
+                      '{view="recipe:tag-list",method="GET"} 2', body)
+        self.assertIn('http_request_db_queries_bucket'
+                      '{view="recipe:tag-list",method="GET",le="+Inf"} 2',
+                      body)
+        self.assertIn('# TYPE http_response_size_bytes histogram', body)
+        self.assertIn('db_connections_opened_total', body)
+
+    def test_cache_counters(self):
+        recipe_stats = {'hits': 3, 'misses': 1}
+        token_stats = {'local_hits': 5, 'shared_hits': 2, 'misses': 4,
+                       'hit_rate': 7 / 11}
+
+        with patch('recipe.cache.cache_stats', return_value=recipe_stats), \
+                patch('user.authentication.token_cache_stats',
+                      return_value=token_stats):
+            body = metrics.render()
+
+        self.assertIn('# TYPE recipe_cache_hits_total counter', body)
+        self.assertIn('\nrecipe_cache_hits_total 3\n', body)
+        self.assertIn('\nrecipe_cache_misses_total 1\n', body)
+        self.assertIn('\nauth_token_cache_local_hits_total 5\n', body)
+        self.assertIn('\nauth_token_cache_shared_hits_total 2\n', body)
+        self.assertIn('\nauth_token_cache_misses_total 4\n', body)
+
+    def test_unmatched_requests_grouped(self):
+        self.client.get('/no/such/page/')
+
+        body = metrics.render()
+
+        self.assertIn('view="<unmatched>",method="GET",status="404"', body)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_hidden_without_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+        res = self.client.get(METRICS_URL,
+                              HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
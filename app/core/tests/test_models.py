@@ -1,6 +1,7 @@
 from unittest.mock import patch
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
 from core import models
@@ -79,3 +80,19 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+    def test_tag_name_unique_per_user(self):
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=other_user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
+    def test_ingredient_name_unique_per_user(self):
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='Salt')
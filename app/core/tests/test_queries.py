@@ -0,0 +1,96 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.queries import QueryBudgetExceeded, fingerprint, query_budget
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_collapses_variable_parts(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT *\n  FROM t WHERE id IN (%s)'),
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (%s, %s), ...',
+        )
+        self.assertEqual(fingerprint('SAVEPOINT "s1402_x3"'),
+                         fingerprint('SAVEPOINT "s1402_x17"'))
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'))
+            recipe.tags.add(Tag.objects.create(user=self.user,
+                                               name=f'Tag {i}'))
+
+    def _tag_names(self, prefetch):
+        recipes = Recipe.objects.all()
+        if prefetch:
+            recipes = recipes.prefetch_related('tags')
+        return [tag.name for recipe in recipes for tag in recipe.tags.all()]
+
+    def test_within_budget(self):
+        with query_budget(max_queries=2, max_repeats=1) as recorder:
+            self._tag_names(prefetch=True)
+
+        self.assertEqual(recorder.count, 2)
+
+    def test_n_plus_one_detected(self):
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            with query_budget(max_repeats=1):
+                self._tag_names(prefetch=False)
+
+        report = str(cm.exception)
+        self.assertIn('3x', report)
+        self.assertIn('"core_recipe_tags"', report)
+        self.assertIn('core/tests/test_queries.py', report)
+
+    def test_too_many_queries(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded,
+                                      '4 queries, more than the 1 allowed'):
+            with query_budget(max_queries=1):
+                self._tag_names(prefetch=False)
+
+    def test_decorator(self):
+        @query_budget(max_queries=1)
+        def count():
+            return Recipe.objects.count()
+
+        self.assertEqual(count(), 3)
+
+
+class QueryReportMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+
+    @override_settings(QUERY_REPORT_SAMPLE_RATE=1,
+                       QUERY_REPORT_MAX_REPEATS=0)
+    def test_sampled_request_reported(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('recipe:tag-list'))
+
+        self.assertIn('Queries of GET /api/recipe/tags/', logs.output[0])
+        self.assertIn('"core_tag"', logs.output[0])
+
+    @override_settings(QUERY_REPORT_SAMPLE_RATE=0,
+                       QUERY_REPORT_MAX_REPEATS=0)
+    @patch('core.middleware.logger.warning')
+    def test_unsampled_request_not_reported(self, patched_warning):
+        self.client.get(reverse('recipe:tag-list'))
+
+        patched_warning.assert_not_called()
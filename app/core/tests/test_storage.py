@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.storage = ContentAddressedStorage(location=media.name)
+
+    def test_name_from_content(self):
+        name = self.storage.save('uploads/recipe/a.JPG', ContentFile(b'x'))
+
+        self.assertEqual(
+            name,
+            'uploads/recipe/2d/2d711642b726b04401627ca9fbac32f5c8530fb19'
+            '03cc4db02258717921a4881.jpg',
+        )
+        with self.storage.open(name) as blob:
+            self.assertEqual(blob.read(), b'x')
+
+    def test_identical_content_stored_once(self):
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        os.utime(self.storage.path(first), (0, 0))
+
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+
+        self.assertEqual(first, second)
+        self.assertGreater(os.path.getmtime(self.storage.path(first)), 0)
+        self.assertEqual(os.listdir(self.storage.path('tmp')), [])
+
+    def test_different_content(self):
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'y'))
+
+        self.assertNotEqual(first, second)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from core import metrics
+
+
+def metrics_view(request):
+    """This process's request metrics, for Prometheus to scrape.
+
+    Served without a token in DEBUG only; otherwise it is hidden until
+    METRICS_TOKEN is set.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(),
+                        content_type='text/plain; version=0.0.4')
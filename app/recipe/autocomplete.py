@@ -0,0 +1,59 @@
+"""
+Name autocomplete for tags and ingredients.
+
+Prefix matches come first, then (with pg_trgm) names similar to the
+typed text, e.g. "tomatoe" finding "Tomato". Both test UPPER(name),
+the expression covered by the trigram GIN indexes of migration 0013.
+Within each group, names used by more of the user's recipes rank first.
+"""
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import (
+    Case,
+    Count,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Upper
+
+_trigram_available = {}
+
+
+def trigram_available(using='default'):
+    """Whether pg_trgm is installed in database `using`."""
+    if using not in _trigram_available:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[using] = cursor.fetchone() is not None
+    return _trigram_available[using]
+
+
+def autocomplete(queryset, through, target, text, limit):
+    """Top `limit` rows of `queryset` whose name matches `text`.
+
+    `through` is the recipe M2M table and `target` its column pointing
+    at the queryset's model; it is used to count each name's recipes.
+    """
+    text = text.upper()
+    usage = through.objects.filter(**{target: OuterRef('pk')}).values(
+        target).annotate(count=Count('*')).values('count')
+    queryset = queryset.annotate(
+        upper_name=Upper('name'),
+        usage=Coalesce(Subquery(usage, output_field=IntegerField()), 0),
+    )
+    prefix = Q(upper_name__startswith=text)
+    if trigram_available(queryset.db):
+        matches = prefix | Q(upper_name__trigram_similar=text)
+        similarity = TrigramSimilarity('upper_name', text)
+    else:
+        matches = prefix | Q(upper_name__contains=text)
+        similarity = Value(0.0)
+    return queryset.filter(matches).annotate(
+        is_prefix=Case(When(prefix, then=Value(1)), default=Value(0)),
+        similarity=similarity,
+    ).order_by('-is_prefix', '-usage', '-similarity', 'name')[:limit]
@@ -0,0 +1,189 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmark import measure, register, rolled_back
+from core.models import Ingredient, Recipe, Tag
+from recipe.filters import RecipeSearchFilter
+from recipe.serializers import RecipeSerializer
+
+
+def _through_rows_written():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT n_tup_ins + n_tup_del FROM pg_stat_xact_user_tables '
+            'WHERE relname = %s',
+            [Recipe.tags.through._meta.db_table]
+        )
+        return cursor.fetchone()[0]
+
+
+@register('m2m_update')
+def m2m_update(stdout, scale=1):
+    """Swap one tag on recipes of growing size; compare with clear+add."""
+    stdout.write(f'{"tags":>8} {"diff ms":>10} {"rows":>8} '
+                 f'{"clear ms":>10} {"rows":>8}')
+    for size in (10, 100, 1000):
+        size *= scale
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                'bench@example.com', 'benchpass123')
+            recipe = Recipe.objects.create(
+                user=user, title='Bench', time_minutes=5,
+                price=Decimal('1.00'))
+            tags = Tag.objects.bulk_create(
+                [Tag(user=user, name=f'tag {i}') for i in range(size)])
+            recipe.tags.add(*tags)
+            names = [{'name': tag.name} for tag in tags]
+            state = {'flip': False}
+
+            def diff_update():
+                state['flip'] = not state['flip']
+                last = 'swapped' if state['flip'] else names[-1]['name']
+                serializer = RecipeSerializer(
+                    recipe,
+                    data={'tags': names[:-1] + [{'name': last}]},
+                    partial=True
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+
+            def clear_update():
+                recipe.tags.clear()
+                recipe.tags.add(*tags)
+
+            before = _through_rows_written()
+            diff_ms, _ = measure(diff_update, repeat=1)
+            diff_rows = _through_rows_written() - before
+            clear_ms, _ = measure(clear_update, repeat=1)
+            clear_rows = _through_rows_written() - before - diff_rows
+        stdout.write(f'{size:>8} {diff_ms:>10.2f} {diff_rows:>8} '
+                     f'{clear_ms:>10.2f} {clear_rows:>8}')
+
+
+# Indexes and constraints added in core.0008, with the SQL that drops them.
+QUERY_INDEXES = [
+    'DROP INDEX "recipe_user_id_desc_idx"',
+    'ALTER TABLE "core_tag" DROP CONSTRAINT "unique_tag_user_name"',
+    'ALTER TABLE "core_ingredient" '
+    'DROP CONSTRAINT "unique_ingredient_user_name"',
+]
+
+
+def _seed_users(users, recipes, names):
+    """Seed `users` accounts plus one power user, rows interleaved.
+
+    The power user owns `recipes` recipes and `names` tags and
+    ingredients, a tenth of each table; the other accounts' rows are
+    interleaved with them, as in a table written by many users over time.
+    """
+    User = get_user_model()
+    accounts = User.objects.bulk_create(
+        [User(email=f'bench{i}@example.com') for i in range(users + 1)])
+    power_user, others = accounts[-1], accounts[:-1]
+    for model, count, fields in (
+        (Recipe, recipes, lambda i: {
+            'title': f'Recipe {i}', 'time_minutes': i % 120,
+            'price': Decimal(i % 500) / 10, 'description': 'x' * 200}),
+        (Tag, names, lambda i: {'name': f'tag {i}'}),
+        (Ingredient, names, lambda i: {'name': f'ing {i}'}),
+    ):
+        rows = []
+        for i in range(count):
+            rows.append(model(user=power_user, **fields(i)))
+            rows += [model(user=others[(i + j) % users], **fields(i))
+                     for j in range(9)]
+        model.objects.bulk_create(rows, batch_size=5000)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return power_user
+
+
+def _explain(queryset):
+    plan = json.loads(queryset.explain(format='json', analyze=True))[0]
+    return plan['Plan']['Total Cost'], plan['Execution Time']
+
+
+def _view_queries(user):
+    """The queries issued by recipe.views, keyed by a short label."""
+    return {
+        'recipe list': Recipe.objects.filter(user=user).order_by('-id')[:51],
+        'tag list': Tag.objects.filter(user=user).order_by('-name')[:51],
+        'tag lookup': Tag.objects.filter(
+            user=user, name__in=[f'tag {i}' for i in range(30)]),
+    }
+
+
+@register('indexes')
+def indexes(stdout, scale=1):
+    """Plan cost and latency of the view queries with/without indexes."""
+    with rolled_back():
+        user = _seed_users(50, 10000 * scale, 2000 * scale)
+        after = {label: _explain(queryset)
+                 for label, queryset in _view_queries(user).items()}
+        with connection.cursor() as cursor:
+            # Flush deferred FK checks so the tables can be altered.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            for sql in QUERY_INDEXES:
+                cursor.execute(sql)
+            cursor.execute('ANALYZE')
+        before = {label: _explain(queryset)
+                  for label, queryset in _view_queries(user).items()}
+
+    stdout.write(f'{"query":<12} {"cost before":>12} {"ms before":>10} '
+                 f'{"cost after":>12} {"ms after":>10}')
+    for label in after:
+        stdout.write(f'{label:<12} {before[label][0]:>12.2f} '
+                     f'{before[label][1]:>10.3f} {after[label][0]:>12.2f} '
+                     f'{after[label][1]:>10.3f}')
+
+
+SEARCH_WORDS = [
+    'curry', 'risotto', 'salad', 'soup', 'stew', 'pie', 'tacos', 'pasta',
+    'saffron', 'lentil', 'chicken', 'tofu', 'mushroom', 'lemon', 'garlic',
+    'ginger', 'coconut', 'basil', 'chili', 'honey',
+]
+
+
+def _search_queries(user):
+    queries = {}
+    for terms in ('curry', 'saffron risotto', 'tofu -chili'):
+        request = Request(APIRequestFactory().get('/', {'search': terms}))
+        queries[terms] = RecipeSearchFilter().filter_queryset(
+            request, Recipe.objects.filter(user=user), None
+        ).order_by('-rank', '-id')[:51]
+    return queries
+
+
+@register('search')
+def search(stdout, scale=1):
+    """Ranked full-text search latency with and without the GIN index."""
+    with rolled_back():
+        user = _seed_users(50, 20000 * scale, 100)
+        words = ', '.join(f"'{word}'" for word in SEARCH_WORDS)
+        with connection.cursor() as cursor:
+            # Titles of two or three words; the trigger indexes them.
+            cursor.execute(
+                f'UPDATE core_recipe SET title = '
+                f'(ARRAY[{words}])[1 + id % 20] || \' \' || '
+                f'(ARRAY[{words}])[1 + (id / 20) % 20] || \' \' || '
+                f'(ARRAY[{words}])[1 + (id / 400) % 20]'
+            )
+            cursor.execute('ANALYZE')
+        after = {terms: _explain(queryset)
+                 for terms, queryset in _search_queries(user).items()}
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('DROP INDEX "recipe_search_vector_idx"')
+            cursor.execute('ANALYZE')
+        before = {terms: _explain(queryset)
+                  for terms, queryset in _search_queries(user).items()}
+
+    stdout.write(f'{"search":<18} {"ms no index":>12} {"ms GIN":>10}')
+    for terms in after:
+        stdout.write(f'{terms:<18} {before[terms][1]:>12.3f} '
+                     f'{after[terms][1]:>10.3f}')
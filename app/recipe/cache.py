@@ -0,0 +1,112 @@
+"""
+Per-user response cache for the recipe API list endpoints.
+
+Each user has a collection version that is replaced on any write to
+their recipes, tags or ingredients (see recipe.signals). Cached
+responses are keyed by that version, so one write orphans every cached
+page for the user at once and the stale entries simply expire. A
+cache that is not shared by every server process (core.caches) is not
+used, as writes in one process could not invalidate the others.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from core import metrics
+from core.caches import shared_across_processes
+
+VERSION_KEY = 'recipe-api:version:{user_id}'
+RESPONSE_KEY = 'recipe-api:response:{user_id}:{version}:{digest}'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def cache_stats():
+    """Hit and miss counters of this process."""
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+metrics.register_counter(
+    'recipe_cache_hits_total', 'Recipe lists served from the cache.',
+    lambda: cache_stats()['hits'])
+metrics.register_counter(
+    'recipe_cache_misses_total', 'Recipe lists built for the cache.',
+    lambda: cache_stats()['misses'])
+
+
+def get_version(user_id):
+    """Current collection version of a user, created if missing.
+
+    Versions are nanosecond timestamps, so a version recreated after an
+    eviction is always newer than any key built from the lost one.
+    """
+    key = VERSION_KEY.format(user_id=user_id)
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, time.time_ns(), timeout=None)
+        version = _cache().get(key)
+    return version
+
+
+def bump_version(user_id):
+    _cache().set(VERSION_KEY.format(user_id=user_id), time.time_ns(),
+                 timeout=None)
+
+
+def invalidate_user(user_id):
+    """Drop a user's cached responses now and again once committed.
+
+    The second bump covers a concurrent request that re-cached the old
+    state between this write and its commit.
+    """
+    bump_version(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_version(user_id))
+
+
+def response_key(request):
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()
+    user_id = request.user.pk
+    return RESPONSE_KEY.format(
+        user_id=user_id, version=get_version(user_id), digest=digest)
+
+
+class CachedListMixin:
+    """Serve `list` from the per-user response cache."""
+
+    def list(self, request, *args, **kwargs):
+        if not shared_across_processes(settings.RECIPE_CACHE_ALIAS):
+            return super().list(request, *args, **kwargs)
+        key = response_key(request)
+        data = _cache().get(key)
+        if data is not None:
+            _count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            _cache().set(key, response.data,
+                         timeout=settings.RECIPE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,126 @@
+"""
+ETag / Last-Modified support for the recipe endpoints.
+
+List validators come from the per-user collection version kept in the
+cache (see recipe.cache) when every process shares that cache, and
+otherwise from the count and latest updated_at of the user's recipes.
+Detail validators come from Recipe.updated_at, so a revalidation that
+ends in 304 never runs the serializer or the list query.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core.caches import shared_across_processes
+from core.models import Recipe
+from recipe.cache import get_version
+
+
+def _collection_version(user):
+    """Version of the user's recipes and its time in seconds."""
+    if shared_across_processes(settings.RECIPE_CACHE_ALIAS):
+        version = get_version(user.pk)
+        return version, version // 10 ** 9
+    # recipe.signals touches updated_at when nested tags or ingredients
+    # change, and deletes show up in the count.
+    stats = Recipe.objects.filter(user=user).aggregate(
+        count=Count('id'), updated_at=Max('updated_at'))
+    updated_at = stats['updated_at']
+    micros = int(updated_at.timestamp() * 10 ** 6) if updated_at else 0
+    return f'{stats["count"]}.{micros}', micros // 10 ** 6
+
+
+def list_validators(request):
+    version, last_modified = _collection_version(request.user)
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()
+    return quote_etag(f'{version}-{digest[:16]}'), last_modified
+
+
+def detail_validators(updated_at):
+    timestamp = updated_at.timestamp()
+    return quote_etag(f'{int(timestamp * 10 ** 6)}'), int(timestamp)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalRecipeMixin:
+    """Conditional GET for list/retrieve and If-Match for updates."""
+
+    def _updated_at(self, pk, lock=False):
+        try:
+            queryset = Recipe.objects.filter(pk=pk, user=self.request.user)
+        except (TypeError, ValueError):
+            return None
+        if lock:
+            queryset = queryset.select_for_update()
+        return queryset.values_list('updated_at', flat=True).first()
+
+    def _conditional(self, request, etag, last_modified, handler, *args,
+                     **kwargs):
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = list_validators(request)
+        response = self._conditional(
+            request, etag, last_modified, super().list, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self._is_conditional(request):
+            response = super().retrieve(request, *args, **kwargs)
+            return set_validators(
+                response, *detail_validators(self.object.updated_at))
+
+        updated_at = self._updated_at(kwargs[self.lookup_field])
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = detail_validators(updated_at)
+        response = self._conditional(
+            request, etag, last_modified, super().retrieve, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def get_object(self):
+        self.object = super().get_object()
+        return self.object
+
+    def _is_conditional(self, request):
+        return any(header in request.META for header in (
+            'HTTP_IF_MATCH',
+            'HTTP_IF_NONE_MATCH',
+            'HTTP_IF_MODIFIED_SINCE',
+            'HTTP_IF_UNMODIFIED_SINCE',
+        ))
+
+    def update(self, request, *args, **kwargs):
+        if not self._is_conditional(request):
+            response = super().update(request, *args, **kwargs)
+        else:
+            # The row stays locked until the write commits, so nobody can
+            # change it between the precondition check and the update.
+            with transaction.atomic():
+                updated_at = self._updated_at(
+                    kwargs[self.lookup_field], lock=True)
+                if updated_at is None:
+                    return super().update(request, *args, **kwargs)
+                etag, last_modified = detail_validators(updated_at)
+                response = self._conditional(
+                    request, etag, last_modified, super().update,
+                    *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(
+                response, *detail_validators(self.object.updated_at))
+        return response
@@ -0,0 +1,128 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import DecimalField, F
+from django.db.models.functions import Cast
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Full-text search over the recipe search document.
+
+    Matches against the GIN-indexed `search_vector` (title, tag and
+    ingredient names, description) and annotates each match with its
+    `rank`, which RecipeOrderingFilter orders by unless told otherwise.
+    The rank is a float4, whose text form does not compare equal to it,
+    so it is cast to numeric: cursor pagination keeps it as its page
+    position and must find the rows tied on it again.
+    """
+    search_param = 'search'
+    config = 'english'
+
+    @classmethod
+    def get_search_terms(cls, request):
+        return request.query_params.get(cls.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = SearchQuery(terms, config=self.config,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query),
+                      output_field=DecimalField(max_digits=12,
+                                                decimal_places=8)))
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Search terms (web search syntax: "quoted '
+                           'phrases", or, -excluded); results are ranked',
+            'schema': {'type': 'string'},
+        }]
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """Upper and lower bounds on cooking time and price.
+
+    Each bound is a range condition on the second column of the
+    `(user, time_minutes, id)` and `(user, price, id)` indexes.
+    """
+    fields = {
+        'max_time': ('time_minutes__lte', serializers.IntegerField(
+            min_value=0)),
+        'min_price': ('price__gte', serializers.DecimalField(
+            max_digits=5, decimal_places=2, min_value=0)),
+        'max_price': ('price__lte', serializers.DecimalField(
+            max_digits=5, decimal_places=2, min_value=0)),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        lookups, errors = {}, {}
+        for param, (lookup, field) in self.fields.items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                lookups[lookup] = field.run_validation(value)
+            except ValidationError as exc:
+                errors[param] = exc.detail
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': param,
+            'required': False,
+            'in': 'query',
+            'description': description,
+            'schema': {'type': schema_type},
+        } for param, schema_type, description in [
+            ('max_time', 'integer', 'Longest cooking time, in minutes'),
+            ('min_price', 'number', 'Lowest price'),
+            ('max_price', 'number', 'Highest price'),
+        ]]
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """`?ordering=` over an allow-list of indexed recipe columns.
+
+    Every ordering ends with `id` in the same direction, matching the
+    trailing column of the `(user, <field>, id)` indexes so the sort is
+    both stable for cursor pagination and read in index order. Without
+    an explicit ordering, search results come best match first and
+    everything else newest first.
+    """
+    ordering_fields = ['time_minutes', 'price', 'id']
+    search_ordering = ['-rank', '-id']
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params:
+            if RecipeSearchFilter.get_search_terms(request):
+                return self.search_ordering
+            return self.get_default_ordering(view)
+        fields = [param.strip() for param in params.split(',')]
+        valid = self.remove_invalid_fields(queryset, fields, view, request)
+        if len(valid) != len(fields):
+            raise ValidationError({self.ordering_param: [
+                f'Expected a comma separated list of '
+                f'{", ".join(self.ordering_fields)}, optionally '
+                f'prefixed with "-".'
+            ]})
+        if fields[-1].lstrip('-') != 'id':
+            fields.append('-id' if fields[-1].startswith('-') else 'id')
+        return fields
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters[0]['schema'] = {
+            'type': 'string',
+            'enum': [prefix + field for field in self.ordering_fields
+                     for prefix in ('', '-')],
+        }
+        return parameters
@@ -0,0 +1,158 @@
+"""
+Background rendering of uploaded recipe images.
+
+`upload_image` only stores the original and marks the recipe pending;
+once the transaction commits the recipe id is handed to a per-process
+thread pool. A worker decodes the original with Pillow, applies the
+EXIF orientation, and writes each size in RECIPE_IMAGE_RENDITIONS as
+WebP and JPEG without metadata. The original was already stripped of
+its metadata in the request (recipe.metadata), so neither it nor the
+renditions ever serve location data, whatever the status. Transparency
+is kept in PNG and WebP and flattened onto white in JPEG.
+
+Originals and renditions live in the content-addressed recipe image
+storage, so recipes sharing a photo share its renditions as well.
+"""
+import io
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import ImageStatus, Recipe
+from core.storage import recipe_image_storage
+from recipe.cache import invalidate_user
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+ORIENTATION = 0x0112
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    """The pool of this process, created after any fork."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def enqueue(recipe_id):
+    """Render the recipe's image once the current transaction commits."""
+    if settings.RECIPE_IMAGE_SYNC:
+        transaction.on_commit(lambda: process(recipe_id))
+    else:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_process_in_worker, recipe_id))
+
+
+def _process_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        process(recipe_id)
+    except Exception:
+        logger.exception('Rendering image of recipe %s failed', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def _encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format,
+               quality=settings.RECIPE_IMAGE_QUALITY, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def _for_format(image, image_format):
+    """`image` in a mode `image_format` can store."""
+    if image_format != 'JPEG':
+        return image
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, 'white')
+        flattened.paste(image, mask=image.getchannel('A'))
+        return flattened
+    return image if image.mode in ('RGB', 'L') else image.convert('RGB')
+
+
+def _render(name):
+    """Store renditions of image `name` and return their paths.
+
+    JPEGs are decoded at the smallest scale that still covers the
+    largest rendition, and each rendition is shrunk from the previous
+    one in place, so a large upload is never held at full size.
+    """
+    sizes = sorted(settings.RECIPE_IMAGE_RENDITIONS.items(),
+                   key=lambda item: item[1], reverse=True)
+    directory = os.path.join(os.path.dirname(name), 'renditions')
+    renditions = {}
+    with recipe_image_storage.open(name) as original:
+        with Image.open(original) as image:
+            if image.format == 'JPEG':
+                # The box the largest rendition fits, as thumbnail() has it.
+                scale = min(sizes[0][1] / max(image.size), 1)
+                image.draft(image.mode, (math.ceil(image.width * scale),
+                                         math.ceil(image.height * scale)))
+            if image.getexif().get(ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            # Palette images only resize nearest-neighbour.
+            if image.mode not in ('RGB', 'L', 'RGBA', 'LA'):
+                image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+
+            for size_name, size in sizes:
+                image.thumbnail((size, size), Image.LANCZOS)
+                renditions[size_name] = {
+                    ext: recipe_image_storage.save(
+                        os.path.join(directory, f'{size_name}.{ext}'),
+                        _encode(_for_format(image, image_format),
+                                image_format))
+                    for ext, image_format in FORMATS.items()
+                }
+    return {size_name: renditions[size_name]
+            for size_name in settings.RECIPE_IMAGE_RENDITIONS}
+
+
+def process(recipe_id):
+    """Render the image currently set on recipe `recipe_id`."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'user_id').first()
+    if recipe is None or not recipe.image:
+        return
+    name = recipe.image.name
+    try:
+        renditions = _render(name)
+        image_status = ImageStatus.READY
+    except Exception:
+        logger.exception('Cannot render %s', name)
+        renditions = {}
+        image_status = ImageStatus.FAILED
+
+    # Skip the update if another upload replaced the image meanwhile;
+    # whatever was written here is then left to gc_images.
+    updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_status=image_status,
+        image_renditions=renditions,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate_user(recipe.user_id)
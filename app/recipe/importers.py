@@ -0,0 +1,163 @@
+"""
+Incremental parsing and chunked writing of recipe dumps.
+
+Uploads are read line by line and written in chunks through
+RecipeSerializer(many=True), so memory stays bounded by the chunk size
+and each chunk costs a handful of bulk inserts.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from recipe.serializers import RecipeSerializer
+
+FORMATS = ['ndjson', 'csv']
+CSV_LIST_SEPARATOR = ';'
+
+
+class ImportReport:
+    """Running totals and per-row errors for one import.
+
+    Only the first `max_errors` errors are kept; the rest are counted.
+    """
+    def __init__(self, max_errors=None):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_errors(self, errors):
+        self.failed += len(errors)
+        self.errors += [
+            {'line': line, 'errors': detail}
+            for line, detail in sorted(errors, key=lambda error: error[0])
+        ]
+        if self.max_errors is not None:
+            del self.errors[self.max_errors:]
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    return 'csv' if extension == 'csv' else None
+
+
+class DecodedLines:
+    """Iterator of decoded lines that survives undecodable ones.
+
+    A line that fails to decode raises UnicodeDecodeError from
+    `__next__` and is skipped; iteration resumes at the next line.
+    `line_num` counts the raw lines read so far.
+    """
+    def __init__(self, fileobj, encoding='utf-8'):
+        self.lines = iter(fileobj)
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.line_num = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.line_num += 1
+        try:
+            return self.decoder.decode(line)
+        except UnicodeDecodeError:
+            self.decoder.reset()
+            raise
+
+
+def _error(exc):
+    return {'non_field_errors': [str(exc)]}
+
+
+def _next_or_error(iterator):
+    """Yield (item, error), turning a bad line into an error."""
+    while True:
+        try:
+            yield next(iterator), None
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as exc:
+            yield None, _error(exc)
+
+
+def read_ndjson(lines):
+    for line, error in _next_or_error(lines):
+        if error:
+            yield lines.line_num, None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield lines.line_num, json.loads(line), None
+        except ValueError as exc:
+            yield lines.line_num, None, _error(exc)
+
+
+def read_csv(lines):
+    """Rows with `tags`/`ingredients` given as ';'-separated names."""
+    reader = csv.DictReader(lines)
+    for row, error in _next_or_error(reader):
+        if error:
+            yield lines.line_num, None, error
+            continue
+        for field in ('tags', 'ingredients'):
+            names = (row.pop(field, None) or '').split(CSV_LIST_SEPARATOR)
+            row[field] = [{'name': name.strip()}
+                          for name in names if name.strip()]
+        yield lines.line_num, row, None
+
+
+def read_records(fileobj, file_format, encoding='utf-8'):
+    """Yield (line, record, error) from a binary file object, lazily.
+
+    Lines that cannot be decoded or parsed become per-line errors.
+    """
+    lines = DecodedLines(fileobj, encoding)
+    if file_format == 'csv':
+        return read_csv(lines)
+    return read_ndjson(lines)
+
+
+def import_recipes(user, records, chunk_size=500, progress=None,
+                   max_errors=None):
+    """Validate and write `records` for `user` one chunk at a time."""
+    report = ImportReport(max_errors)
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return report
+
+        lines = []
+        data = []
+        errors = []
+        for line, record, error in chunk:
+            if error:
+                errors.append((line, error))
+            else:
+                lines.append(line)
+                data.append(record)
+
+        serializer = RecipeSerializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user)
+        errors += [
+            (lines[index], detail)
+            for index, detail in serializer.item_errors.items()
+        ]
+        report.created += len(serializer.item_indexes)
+        report.add_errors(errors)
+
+        if progress:
+            progress(report)
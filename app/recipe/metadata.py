@@ -0,0 +1,231 @@
+"""
+Lossless removal of metadata from uploaded recipe images.
+
+The upload is copied segment by segment (JPEG) or chunk by chunk (PNG,
+WebP) without decoding any pixels, leaving out EXIF, XMP, IPTC, text
+chunks and comments, so the stored original never carries location
+data. The EXIF orientation is written back on its own so the image
+still displays upright; ICC profiles and the JPEG Adobe segment, which
+decoding needs for the right colours, are kept.
+"""
+import hashlib
+import struct
+import zlib
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+ORIENTATION = 0x0112
+EXIF_HEADER = b'Exif\x00\x00'
+CHUNK_SIZE = 64 * 2 ** 10
+
+# JPEG markers.
+SOI, EOI, SOS, APP0, APP1, APP2, APP14, COM = (
+    0xD8, 0xD9, 0xDA, 0xE0, 0xE1, 0xE2, 0xEE, 0xFE)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_DROPPED = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+WEBP_EXIF_FLAG = 0x08
+WEBP_XMP_FLAG = 0x04
+
+
+class CorruptImage(ValueError):
+    pass
+
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise CorruptImage('Unexpected end of file.')
+    return data
+
+
+def _orientation(tiff):
+    """The Orientation of EXIF data `tiff`, if it turns the image."""
+    try:
+        order = {b'II': '<', b'MM': '>'}[tiff[:2]]
+        offset, = struct.unpack(order + 'I', tiff[4:8])
+        count, = struct.unpack(order + 'H', tiff[offset:offset + 2])
+        for index in range(count):
+            entry = offset + 2 + 12 * index
+            tag, kind, _count, value = struct.unpack(
+                order + 'HHIH', tiff[entry:entry + 10])
+            if tag == ORIENTATION and kind == 3:
+                return value if 2 <= value <= 8 else None
+    except (KeyError, struct.error):
+        pass
+    return None
+
+
+def _exif(orientation):
+    """EXIF data holding nothing but `orientation`."""
+    return struct.pack('>2sHIHHHIHHI', b'MM', 42, 8, 1, ORIENTATION, 3, 1,
+                       orientation, 0, 0)
+
+
+def _skip_scan(file):
+    """Move past entropy-coded JPEG data to the marker that ends it."""
+    while True:
+        start = file.tell()
+        data = file.read(CHUNK_SIZE)
+        if len(data) < 2:
+            raise CorruptImage('Unexpected end of file.')
+        index = data.find(b'\xff')
+        while 0 <= index < len(data) - 1:
+            # Stuffed zero bytes and restart markers belong to the scan.
+            if data[index + 1] != 0 and not 0xD0 <= data[index + 1] <= 0xD7:
+                file.seek(start + index)
+                return
+            index = data.find(b'\xff', index + 1)
+        # Look at a trailing 0xFF again with the byte that follows it.
+        file.seek(start + len(data) - (1 if data[-1] == 0xFF else 0))
+
+
+def _jpeg_pieces(file):
+    if _read_exactly(file, 2) != b'\xff\xd8':
+        raise CorruptImage('Not a JPEG file.')
+    pieces = [b'\xff\xd8']
+    exif_at = 1
+    orientation = None
+    while True:
+        if _read_exactly(file, 1) != b'\xff':
+            raise CorruptImage('Expected a JPEG marker.')
+        marker = _read_exactly(file, 1)[0]
+        if marker == 0xFF:
+            file.seek(-1, 1)
+            continue
+        if marker == EOI:
+            # Anything after the image, such as the extra pictures of
+            # MPF files with their own EXIF, is left out too.
+            pieces.append(b'\xff\xd9')
+            break
+        start = file.tell() - 2
+        length, = struct.unpack('>H', _read_exactly(file, 2))
+        if length < 2:
+            raise CorruptImage('Bad JPEG segment length.')
+        payload = _read_exactly(file, min(length - 2, 16))
+        if marker == APP1 and payload.startswith(EXIF_HEADER):
+            file.seek(start + 4)
+            exif = _read_exactly(file, length - 2)
+            orientation = _orientation(exif[len(EXIF_HEADER):])
+        keep = not (APP0 <= marker <= 0xEF or marker == COM) or \
+            marker in (APP0, APP14) or \
+            (marker == APP2 and payload.startswith(b'ICC_PROFILE\x00'))
+        if keep:
+            pieces.append((start, length + 2))
+            if marker == APP0 and exif_at == len(pieces) - 1:
+                exif_at = len(pieces)
+        file.seek(start + 2 + length)
+        if marker == SOS:
+            _skip_scan(file)
+            pieces.append((start + 2 + length, file.tell() - start - 2 -
+                           length))
+    if orientation:
+        exif = EXIF_HEADER + _exif(orientation)
+        pieces.insert(exif_at, b'\xff\xe1' +
+                      struct.pack('>H', len(exif) + 2) + exif)
+    return pieces
+
+
+def _png_chunk(chunk_type, data):
+    return (struct.pack('>I', len(data)) + chunk_type + data +
+            struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+
+def _png_pieces(file):
+    if _read_exactly(file, 8) != PNG_SIGNATURE:
+        raise CorruptImage('Not a PNG file.')
+    pieces = [PNG_SIGNATURE]
+    orientation = None
+    while True:
+        start = file.tell()
+        length, chunk_type = struct.unpack('>I4s', _read_exactly(file, 8))
+        if chunk_type == b'eXIf':
+            orientation = _orientation(_read_exactly(file, length))
+        if chunk_type not in PNG_DROPPED:
+            pieces.append((start, length + 12))
+        file.seek(start + length + 12)
+        if chunk_type == b'IEND':
+            break
+    if orientation:
+        # eXIf has to come before the image data; IHDR is always first.
+        pieces.insert(2, _png_chunk(b'eXIf', _exif(orientation)))
+    return pieces
+
+
+def _webp_pieces(file):
+    riff, _size, webp = struct.unpack('<4sI4s', _read_exactly(file, 12))
+    if riff != b'RIFF' or webp != b'WEBP':
+        raise CorruptImage('Not a WebP file.')
+    pieces = []
+    extended = None
+    orientation = None
+    while True:
+        start = file.tell()
+        header = file.read(8)
+        if not header:
+            break
+        if len(header) != 8:
+            raise CorruptImage('Unexpected end of file.')
+        fourcc, size = struct.unpack('<4sI', header)
+        padded = size + (size & 1)
+        if fourcc == b'EXIF':
+            exif = _read_exactly(file, size)
+            if exif.startswith(EXIF_HEADER):
+                exif = exif[len(EXIF_HEADER):]
+            orientation = _orientation(exif)
+        elif fourcc == b'VP8X':
+            data = bytearray(_read_exactly(file, size))
+            data[0] &= ~(WEBP_EXIF_FLAG | WEBP_XMP_FLAG) & 0xFF
+            extended = data
+            pieces.append(extended)
+        elif fourcc != b'XMP ':
+            pieces.append((start, 8 + padded))
+        file.seek(start + 8 + padded)
+    if orientation and extended is not None:
+        extended[0] |= WEBP_EXIF_FLAG
+        exif = _exif(orientation)
+        pieces.append(b'EXIF' + struct.pack('<I', len(exif)) + exif)
+    if extended is not None:
+        index = pieces.index(extended)
+        pieces[index] = (b'VP8X' + struct.pack('<I', len(extended)) +
+                         bytes(extended))
+    size = 4 + sum(piece[1] if isinstance(piece, tuple) else len(piece)
+                   for piece in pieces)
+    return [b'RIFF' + struct.pack('<I', size) + b'WEBP'] + pieces
+
+
+PARSERS = {'JPEG': _jpeg_pieces, 'PNG': _png_pieces, 'WEBP': _webp_pieces}
+
+
+def strip_metadata(file, image_format):
+    """Copy of uploaded image `file` without metadata.
+
+    The copy is a temporary file hashed on the way, which the recipe
+    image storage moves into place without reading it again. Raises
+    CorruptImage if the file cannot be parsed.
+    """
+    file.seek(0)
+    try:
+        pieces = PARSERS[image_format](file)
+    except struct.error:
+        raise CorruptImage('Unexpected end of file.')
+
+    stripped = TemporaryUploadedFile(
+        file.name, getattr(file, 'content_type', None), 0, None)
+    sha256 = hashlib.sha256()
+    for piece in pieces:
+        if isinstance(piece, tuple):
+            offset, remaining = piece
+            file.seek(offset)
+            while remaining:
+                chunk = _read_exactly(file, min(remaining, CHUNK_SIZE))
+                sha256.update(chunk)
+                stripped.write(chunk)
+                remaining -= len(chunk)
+        else:
+            sha256.update(piece)
+            stripped.write(piece)
+    stripped.size = stripped.tell()
+    stripped.seek(0)
+    stripped.sha256 = sha256.hexdigest()
+    file.seek(0)
+    return stripped
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over a user's recipes, newest first.
+
+    Views with a RecipeOrderingFilter are paged in the order it picks.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over tags and ingredients, by name."""
+    ordering = '-name'
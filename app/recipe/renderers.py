@@ -0,0 +1,21 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON, one object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(self.render_line(item) for item in items).encode()
+
+    @staticmethod
+    def render_line(item):
+        return json.dumps(item, cls=JSONEncoder) + '\n'
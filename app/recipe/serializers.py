@@ -1,55 +1,299 @@
 
+from django.db import transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from recipe import images
+from recipe.cache import invalidate_user
+from recipe.uploads import HeaderCheckedImageField
+from core.metrics import TimedDataMixin, TimedListSerializer
+from core.storage import recipe_image_storage
 from core.models import (
+ ImageStatus,
  Recipe,
  Tag,
  Ingredient
 )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class AutocompleteSerializer(TimedDataMixin, serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    usage = serializers.IntegerField(
+        help_text='Number of your recipes using it')
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+
+class RecipeListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """Validates and writes many recipes at once.
+
+    Invalid items do not fail the whole batch: their errors are kept in
+    `item_errors` by input position and the remaining items are saved.
+    Tag and ingredient names are resolved once for the whole batch and
+    rows are written with chunked bulk inserts.
+    """
+    chunk_size = 500
+    related = [('tags', Tag), ('ingredients', Ingredient)]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+
+        self.updating = self.instance is not None
+        self.item_errors = {}
+        self.item_indexes = []
+        self.item_instances = []
+        existing = self._existing_instances(data)
+        ret = []
+        for index, item in enumerate(data):
+            try:
+                instance = self._item_instance(item, existing)
+                validated = self.child.run_validation(item)
+            except ValidationError as exc:
+                self.item_errors[index] = exc.detail
+            else:
+                ret.append(validated)
+                self.item_indexes.append(index)
+                self.item_instances.append(instance)
+        return ret
+
+    def _existing_instances(self, data):
+        if self.instance is None:
+            return {}
+        ids = [
+            item['id'] for item in data
+            if isinstance(item, dict) and isinstance(item.get('id'), int)
+        ]
+        return {obj.id: obj for obj in self.instance.filter(id__in=ids)}
+
+    def _item_instance(self, item, existing):
+        if not self.updating:
+            return None
+        pk = item.get('id') if isinstance(item, dict) else None
+        if pk not in existing:
+            raise ValidationError({'id': ['Not found.']})
+        if existing[pk] is None:
+            raise ValidationError({'id': ['Duplicate item in batch.']})
+        instance, existing[pk] = existing[pk], None
+        return instance
+
+    def _pop_related(self, validated_data):
+        return [
+            {name: attrs.pop(name, None) for name, _ in self.related}
+            for attrs in validated_data
+        ]
+
+    def _resolve_related(self, related, user_id):
+        objs = {}
+        for name, model in self.related:
+            names = [
+                item['name']
+                for relations in related if relations[name]
+                for item in relations[name]
+            ]
+            objs[name] = {
+                obj.name: obj
+                for obj in self.child._get_or_create_named(
+                    model, names, user_id)
+            }
+        return objs
+
+    def _write_through(self, recipes, related, objs):
+        for name, model in self.related:
+            through = getattr(Recipe, name).through
+            fk = f'{model._meta.model_name}_id'
+            rows = [
+                through(recipe_id=recipe.id, **{fk: objs[name][item_name].id})
+                for recipe, relations in zip(recipes, related)
+                if relations[name]
+                for item_name in dict.fromkeys(
+                    item['name'] for item in relations[name])
+            ]
+            through.objects.bulk_create(
+                rows, batch_size=self.chunk_size, ignore_conflicts=True)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        if not validated_data:
+            return []
+        related = self._pop_related(validated_data)
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**attrs) for attrs in validated_data],
+            batch_size=self.chunk_size
+        )
+        objs = self._resolve_related(related, recipes[0].user_id)
+        self._write_through(recipes, related, objs)
+        self._written(recipes)
+        return recipes
+
+    @transaction.atomic
+    def update(self, instances, validated_data):
+        if not validated_data:
+            return []
+        related = self._pop_related(validated_data)
+        recipes = self.item_instances
+        fields = {'updated_at'}
+        now = timezone.now()
+        for recipe, attrs in zip(recipes, validated_data):
+            attrs.pop('user', None)
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            recipe.updated_at = now
+            fields.update(attrs)
+        Recipe.objects.bulk_update(
+            recipes, fields, batch_size=self.chunk_size)
+
+        objs = self._resolve_related(related, recipes[0].user_id)
+        for name, model in self.related:
+            through = getattr(Recipe, name).through
+            replaced = [
+                recipe.id for recipe, relations in zip(recipes, related)
+                if relations[name] is not None
+            ]
+            through.objects.filter(recipe_id__in=replaced).exclude(
+                id__in=self._kept_through_ids(
+                    through, model, recipes, related, name)
+            ).delete()
+        self._write_through(recipes, related, objs)
+        self._written(recipes)
+        return recipes
+
+    def _written(self, recipes):
+        """Stand in for the model signals that bulk writes skip."""
+        invalidate_user(recipes[0].user_id)
+
+    def _kept_through_ids(self, through, model, recipes, related, name):
+        """Through rows whose name is still requested for their recipe."""
+        requested = {
+            recipe.id: {item['name'] for item in relations[name]}
+            for recipe, relations in zip(recipes, related)
+            if relations[name] is not None
+        }
+        rows = through.objects.filter(
+            recipe_id__in=requested
+        ).values_list('id', 'recipe_id', f'{model._meta.model_name}__name')
+        return [
+            row_id for row_id, recipe_id, item_name in rows
+            if item_name in requested[recipe_id]
+        ]
+
+    @property
+    def results(self):
+        """Per-item outcome, in the order the items were submitted."""
+        status = 'updated' if self.updating else 'created'
+        results = [
+            {'index': index, 'status': 'error', 'errors': errors}
+            for index, errors in self.item_errors.items()
+        ]
+        results += [
+            {'index': index, 'status': status, 'id': recipe.id}
+            for index, recipe in zip(self.item_indexes, self.instance or [])
+        ]
+        return sorted(results, key=lambda result: result['index'])
+
+
+class RecipeSerializer(TimedDataMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
 
+    # Relations rendered by this serializer; views prefetch them so a
+    # list costs a fixed number of queries regardless of its length.
+    prefetch_fields = ['tags', 'ingredients']
+
     class Meta:
         model = Recipe
         fields = [
                 'id', 'title', 'time_minutes', 'price', 'link', 'tags',
                 'ingredients']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _get_or_create_named(self, model, names, user_id):
+        """Resolve tag/ingredient names to objects with set-based queries.
+
+        Existing names are fetched in one query and the missing ones are
+        inserted with a single bulk_create. Rows created concurrently by
+        another request are picked up by the second lookup instead of
+        raising, so the result matches a per-item get_or_create.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+
+        objs = self._filter_named(model, user_id, names)
+        missing = [
+            model(user_id=user_id, name=name)
+            for name in names if name not in objs
+        ]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            objs.update(self._filter_named(
+                model, user_id, [obj.name for obj in missing]))
+
+        return [objs[name] for name in names]
+
+    def _filter_named(self, model, user_id, names):
+        objs = {}
+        queryset = model.objects.filter(
+            user_id=user_id,
+            name__in=names
+        ).order_by('id')
+        for obj in queryset:
+            objs.setdefault(obj.name, obj)
+        return objs
+
+    def _set_named(self, manager, model, items, recipe):
+        """Point a recipe's tags/ingredients at exactly the given names.
+
+        Only through rows whose names were dropped are deleted and only
+        the newly requested names are resolved and inserted, so the work
+        grows with the size of the change, not of the collection.
+        """
+        # Ordered like the request, with constant-time membership tests.
+        names = dict.fromkeys(item['name'] for item in items)
+        current = {obj.name: obj for obj in manager.all()}
+        stale = [obj for name, obj in current.items() if name not in names]
+        added = self._get_or_create_named(
+            model,
+            [name for name in names if name not in current],
+            recipe.user_id
+        )
+        if stale:
+            manager.remove(*stale)
+        if added:
+            manager.add(*added)
 
     def _get_or_create_tags(self, tags, recipe):
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                    user=auth_user,
-                    name=tag['name']
-                )
-            recipe.tags.add(tag_obj)
+        names = [tag['name'] for tag in tags]
+        recipe.tags.add(
+            *self._get_or_create_named(Tag, names, recipe.user_id))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                    user=auth_user,
-                    name=ingredient['name']
-                )
-            recipe.ingredients.add(ingredient_obj)
+        names = [ingredient['name'] for ingredient in ingredients]
+        recipe.ingredients.add(
+            *self._get_or_create_named(Ingredient, names, recipe.user_id))
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
@@ -58,29 +302,65 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._get_or_create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._set_named(instance.tags, Tag, tags, instance)
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            self._set_named(
+                instance.ingredients, Ingredient, ingredients, instance)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         return instance
 
 
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Rendition paths as URLs, by size name then format."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for size_name, formats in value.items():
+            urls[size_name] = {}
+            for ext, path in formats.items():
+                url = recipe_image_storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[size_name][ext] = url
+        return urls
+
+
 class RecipeDetailSerializer(RecipeSerializer):
+    image_renditions = ImageRenditionsField()
+
     class Meta (RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status', 'image_renditions']
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            'image_status']
+
 
+class RecipeImageSerializer(TimedDataMixin, serializers.ModelSerializer):
+    image = HeaderCheckedImageField()
+    image_renditions = ImageRenditionsField()
 
-class RecipeImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': True}}
+        fields = ['id', 'image', 'image_status', 'image_renditions']
+        read_only_fields = ['id', 'image_status']
+
+    def update(self, instance, validated_data):
+        """Store the original and queue it for rendering.
+
+        Files of the previous image may be shared with other recipes;
+        gc_images removes them once unreferenced.
+        """
+        validated_data['image_status'] = ImageStatus.PENDING
+        validated_data['image_renditions'] = {}
+        instance = super().update(instance, validated_data)
+        images.enqueue(instance.pk)
+        return instance
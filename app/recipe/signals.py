@@ -0,0 +1,54 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import invalidate_user
+
+RECIPE_RELATIONS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def touch_recipes(**lookup):
+    """Bump updated_at of recipes whose nested data changed."""
+    Recipe.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_write(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_on_rename(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(**{RECIPE_RELATIONS[sender]: instance})
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_on_delete(sender, instance, **kwargs):
+    touch_recipes(**{RECIPE_RELATIONS[sender]: instance})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_relation_change(sender, instance, action, reverse,
+                                  pk_set, **kwargs):
+    if action.startswith('post_'):
+        invalidate_user(instance.user_id)
+    # Changes made from the tag/ingredient side do not save the recipes.
+    if reverse and action in ('post_add', 'post_remove'):
+        touch_recipes(pk__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        touch_recipes(**{RECIPE_RELATIONS[type(instance)]: instance})
@@ -0,0 +1,128 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import cache
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_user(email='test@example.com', password='testpass123'):
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 5,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(SERVER_PROCESSES=4)
+    def test_process_local_cache_bypassed(self):
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_second_list_served_from_cache(self):
+        create_recipe(user=self.user)
+        stats = cache.cache_stats()
+
+        first = self.client.get(RECIPE_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache.cache_stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(cache.cache_stats()['misses'], stats['misses'] + 1)
+
+    def test_query_params_cached_separately(self):
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_cache_per_user(self):
+        other_user = create_user(email='other@example.com')
+        create_recipe(user=other_user)
+        self.client.get(RECIPE_URL)
+
+        self.client.force_authenticate(other_user)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_invalidated_on_recipe_create(self):
+        self.client.get(RECIPE_URL)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_invalidated_on_tag_rename(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(RECIPE_URL)
+        self.client.get(TAGS_URL)
+
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'],
+                         'Vegetarian')
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.data['results'][0]['name'], 'Vegetarian')
+
+    def test_invalidated_on_relation_change(self):
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results'][0]['tags']), 1)
+
+    def test_invalidated_on_bulk_create(self):
+        self.client.get(RECIPE_URL)
+        payload = [{'title': 'Bulk', 'time_minutes': 5, 'price': '1.00'}]
+        self.client.post(BULK_URL, payload, format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_other_user_write_keeps_cache(self):
+        other_user = create_user(email='other@example.com')
+        self.client.get(RECIPE_URL)
+
+        create_recipe(user=other_user)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
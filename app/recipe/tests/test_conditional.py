@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 5,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertIn('Last-Modified', res)
+
+    def test_list_etag_changes_on_write(self):
+        res = self.client.get(RECIPE_URL)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    @override_settings(SERVER_PROCESSES=4)
+    def test_list_etag_from_database_without_shared_cache(self):
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        recipe.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_not_modified(self):
+        recipe = create_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(detail_url(recipe.id),
+                                  HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_on_tag_rename(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_other_user_not_found(self):
+        other_user = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        recipe = create_recipe(user=other_user)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_if_match(self):
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        res = self.client.patch(detail_url(recipe.id), {'title': 'New'},
+                                HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'New')
+
+    def test_update_if_match_stale(self):
+        recipe = create_recipe(user=self.user, title='Original')
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+        self.client.patch(detail_url(recipe.id), {'title': 'First'})
+
+        res = self.client.patch(detail_url(recipe.id), {'title': 'Second'},
+                                HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First')
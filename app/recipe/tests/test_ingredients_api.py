@@ -46,7 +46,7 @@ class PrivateIngredientApiTests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_ingredients_limited_to_user(self):
         other_user = create_user(email="other@example.com")
@@ -56,9 +56,9 @@ class PrivateIngredientApiTests(TestCase):
         res = self.client.get(INGREDIENTURL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
 
     def test_update_ingredient(self):
         ingredient = Ingredient.objects.create(user=self.user, name="Cinamon")
@@ -97,8 +97,8 @@ class PrivateIngredientApiTests(TestCase):
 
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_filtered_ingredients_unique(self):
         ingredient1 = Ingredient.objects.create(user=self.user, name="Eggs")
@@ -120,4 +120,4 @@ class PrivateIngredientApiTests(TestCase):
 
         res = self.client.get(INGREDIENTURL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
@@ -0,0 +1,93 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from PIL import Image, PngImagePlugin
+
+from recipe.metadata import CorruptImage, strip_metadata
+
+GPS_IFD = 0x8825
+DESCRIPTION = 0x010e
+ORIENTATION = 0x0112
+
+
+def _exif(orientation=None):
+    exif = Image.Exif()
+    exif[DESCRIPTION] = 'secret description'
+    exif[GPS_IFD] = {1: 'N', 2: (51.0, 30.0, 0.0)}
+    if orientation:
+        exif[ORIENTATION] = orientation
+    return exif
+
+
+def _upload(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return SimpleUploadedFile('photo', buffer.getvalue())
+
+
+class StripMetadataTests(SimpleTestCase):
+    def _strip(self, upload, image_format):
+        stripped = strip_metadata(upload, image_format)
+        self.addCleanup(stripped.close)
+        content = stripped.read()
+        self.assertEqual(len(content), stripped.size)
+        return Image.open(BytesIO(content))
+
+    def test_jpeg(self):
+        original = Image.new('RGB', (64, 32), 'red')
+        upload = _upload(original, 'JPEG', exif=_exif(orientation=6),
+                         comment=b'shot at home')
+
+        with self._strip(upload, 'JPEG') as image:
+            exif = image.getexif()
+            self.assertEqual(dict(exif), {ORIENTATION: 6})
+            self.assertNotIn('comment', image.info)
+            image.load()
+            self.assertEqual(image.size, (64, 32))
+
+    def test_jpeg_progressive_keeps_every_scan(self):
+        original = Image.effect_noise((64, 64), 50).convert('RGB')
+        upload = _upload(original, 'JPEG', exif=_exif(), progressive=True)
+
+        with self._strip(upload, 'JPEG') as image:
+            self.assertFalse(image.getexif())
+            image.load()
+        with Image.open(upload) as expected:
+            self.assertEqual(image.tobytes(), expected.tobytes())
+
+    def test_png(self):
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Location', 'home')
+        upload = _upload(Image.new('RGBA', (8, 8)), 'PNG', pnginfo=info,
+                         exif=_exif(orientation=3))
+
+        with self._strip(upload, 'PNG') as image:
+            image.load()
+            self.assertEqual(image.text, {})
+            self.assertEqual(dict(image.getexif()), {ORIENTATION: 3})
+
+    def test_webp(self):
+        upload = _upload(Image.new('RGB', (8, 8)), 'WEBP', exif=_exif(),
+                         xmp=b'<x:xmpmeta>home</x:xmpmeta>')
+
+        with self._strip(upload, 'WEBP') as image:
+            image.load()
+            self.assertNotIn('xmp', image.info)
+            self.assertFalse(image.getexif())
+
+    def test_stripped_file_is_hashed(self):
+        upload = _upload(Image.new('RGB', (8, 8)), 'JPEG', exif=_exif())
+
+        stripped = strip_metadata(upload, 'JPEG')
+        self.addCleanup(stripped.close)
+
+        self.assertEqual(len(stripped.sha256), 64)
+        self.assertTrue(stripped.temporary_file_path())
+
+    def test_truncated_file(self):
+        upload = _upload(Image.new('RGB', (8, 8)), 'PNG')
+        upload = SimpleUploadedFile('photo', upload.read()[:40])
+
+        with self.assertRaises(CorruptImage):
+            strip_metadata(upload, 'PNG')
@@ -1,8 +1,15 @@
+import hashlib
+import io
+import json
 import os
 import tempfile
+from unittest.mock import patch
 from PIL import Image
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.db import connection
 
 from recipe.serializers import (
  RecipeSerializer,
@@ -11,14 +18,20 @@ from recipe.serializers import (
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from core.queries import query_budget
+from core.storage import recipe_image_storage
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
     )
 from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+IMPORT_URL = reverse('recipe:recipe-import-file')
 
 
 def image_upload_url(recipe_id):
@@ -54,6 +67,11 @@ class PublicRecipeAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_export_auth_required(self):
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
 
 class PrivateRecipeAPITests(TestCase):
     def setUp(self):
@@ -72,7 +90,7 @@ class PrivateRecipeAPITests(TestCase):
         res = self.client.get(RECIPE_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         other_user = create_user(
@@ -85,7 +103,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
         res = self.client.get(RECIPE_URL)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_get_recipe_detail(self):
@@ -283,6 +301,29 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_breakfast, recipe.tags.all())
 
+    def test_update_tags_only_rewrites_changed_rows(self):
+        recipe = create_recipe(user=self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Breakfast', 'Lunch', 'Dinner']
+        ]
+        recipe.tags.add(*tags)
+        through = Recipe.tags.through.objects.filter(recipe=recipe)
+        kept = set(through.exclude(tag=tags[-1]).values_list('id', flat=True))
+
+        payload = {
+            'tags': [{'name': 'Breakfast'}, {'name': 'Lunch'},
+                     {'name': 'Brunch'}]
+        }
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()),
+            ['Breakfast', 'Brunch', 'Lunch']
+        )
+        self.assertTrue(kept.issubset(through.values_list('id', flat=True)))
+
     def test_clear_recipe_tags(self):
         recipe = create_recipe(user=self.user)
         tag = Tag.objects.create(user=self.user, name="Dessert")
@@ -295,6 +336,40 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_create_recipe_with_many_tags_batched(self):
+        Tag.objects.create(user=self.user, name='Tag 0')
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 5,
+            'price': Decimal('5.00'),
+            'tags': [{'name': f'Tag {i}'} for i in range(30)],
+            'ingredients': [{'name': f'Ing {i}'} for i in range(40)],
+        }
+
+        with self.assertNumQueries(15):
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 40)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+
+    def test_create_recipe_with_duplicate_tag_names(self):
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 5,
+            'price': Decimal('5.00'),
+            'tags': [{'name': 'Dinner'}, {'name': 'Dinner'}],
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+
     def test_create_recipe_with_new_ingredients(self):
         payload = {
             'title': 'Cauliflower Tacos',
@@ -417,9 +492,9 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         recipe1 = create_recipe(user=self.user, title='Posh Beans on Toast')
@@ -438,11 +513,554 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_by_tags_match_all(self):
+        recipe1 = create_recipe(user=self.user, title='Vegan Curry')
+        recipe2 = create_recipe(user=self.user, title='Vegan Salad')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']],
+                         [recipe1.id])
+        self.assertNotIn('DISTINCT', ctx.captured_queries[0]['sql'])
+
+    def test_filter_by_tags_no_duplicates(self):
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([r['id'] for r in res.data['results']],
+                         [recipe.id])
+
+    def test_filter_invalid_match(self):
+        res = self.client.get(RECIPE_URL, {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _create_recipe_with_relations(self, index):
+        recipe = create_recipe(user=self.user, title=f'Recipe {index}')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name=f'Tag {index}'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name=f'Ing {index}'))
+        return recipe
+
+    def test_list_query_count_constant(self):
+        self._create_recipe_with_relations(0)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+        for index in range(1, 10):
+            self._create_recipe_with_relations(index)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        for item in res.data['results']:
+            self.assertEqual(len(item['tags']), 1)
+            self.assertEqual(len(item['ingredients']), 1)
+
+    def test_retrieve_prefetches_relations(self):
+        recipe = self._create_recipe_with_relations(0)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Tag 0')
+        self.assertEqual(res.data['ingredients'][0]['name'], 'Ing 0')
+
+    def test_list_query_budget(self):
+        for index in range(5):
+            self._create_recipe_with_relations(index)
+        tag = Tag.objects.get(name='Tag 0')
+
+        for params in [{}, {'tags': tag.id, 'match': 'all'},
+                       {'search': 'recipe', 'ordering': 'price'}]:
+            with query_budget(max_queries=3, max_repeats=1):
+                res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_paginated_by_cursor(self):
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    @patch('recipe.pagination.RecipeCursorPagination.max_page_size', 3)
+    def test_list_page_size_capped(self):
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPE_URL, {'page_size': 1000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIsNotNone(res.data['next'])
+
+
+class BulkRecipeAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, count, prefix=''):
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 5,
+                'price': '5.00',
+                'tags': [{'name': f'{prefix}Dinner'},
+                         {'name': f'{prefix}Tag {i}'}],
+                'ingredients': [{'name': f'{prefix}Salt'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        payload = self._payload(3)
+        payload[1]['time_minutes'] = 'not a number'
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual([r['status'] for r in results],
+                         ['created', 'error', 'created'])
+        self.assertIn('time_minutes', results[1]['errors'])
+        recipe = Recipe.objects.get(id=results[2]['id'])
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(recipe.title, 'Recipe 2')
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()),
+            ['Dinner', 'Tag 2']
+        )
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Dinner').count(), 1)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_query_count_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_URL, self._payload(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_URL, self._payload(50, 'Big '),
+                             format='json')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 52)
+
+    def test_bulk_update(self):
+        other_user = create_user(email='other@example.com',
+                                 password='testpass123')
+        recipe1 = create_recipe(user=self.user, title='Old 1')
+        recipe2 = create_recipe(user=self.user, title='Old 2')
+        recipe2.tags.add(Tag.objects.create(user=self.user, name='Lunch'))
+        other_recipe = create_recipe(user=other_user)
+        payload = [
+            {'id': recipe1.id, 'title': 'New 1'},
+            {'id': recipe2.id, 'tags': [{'name': 'Dinner'}]},
+            {'id': other_recipe.id, 'title': 'Hijacked'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data['results']],
+                         ['updated', 'updated', 'error'])
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        other_recipe.refresh_from_db()
+        self.assertEqual(recipe1.title, 'New 1')
+        self.assertEqual(recipe2.title, 'Old 2')
+        self.assertEqual([tag.name for tag in recipe2.tags.all()],
+                         ['Dinner'])
+        self.assertNotEqual(other_recipe.title, 'Hijacked')
+
+    def test_bulk_delete(self):
+        other_user = create_user(email='other@example.com',
+                                 password='testpass123')
+        recipe = create_recipe(user=self.user)
+        other_recipe = create_recipe(user=other_user)
+
+        res = self.client.delete(
+            BULK_URL, [recipe.id, other_recipe.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data['results']],
+                         ['deleted', 'error'])
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+
+    @patch('recipe.views.RecipeViewSet.bulk_max_items', 2)
+    def test_bulk_too_many_items(self):
+        res = self.client.post(BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ExportRecipeAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        return res, [json.loads(line) for line in lines]
+
+    @patch('recipe.views.RecipeViewSet.export_chunk_size', 2)
+    def test_export_streams_ndjson(self):
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        recipes[0].tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        create_recipe(
+            user=create_user(email='other@example.com', password='pass1234'))
+
+        res, items = self._export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([item['id'] for item in items],
+                         [recipe.id for recipe in reversed(recipes)])
+        self.assertEqual(items[-1]['tags'][0]['name'], 'Vegan')
+        self.assertEqual(items[0]['description'], recipes[-1].description)
+
+    def test_export_applies_filters(self):
+        recipe = create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        res, items = self._export(tags=str(tag.id))
+
+        self.assertEqual([item['id'] for item in items], [recipe.id])
+
+    def test_export_applies_filter_backends(self):
+        recipe = create_recipe(
+            user=self.user, title='Thai curry', time_minutes=20)
+        create_recipe(user=self.user, title='Thai curry', time_minutes=90)
+        create_recipe(user=self.user, title='Porridge', time_minutes=5)
+
+        res, items = self._export(search='curry', max_time='30')
+
+        self.assertEqual([item['id'] for item in items], [recipe.id])
+
+
+class ImportRecipeAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, name, content, **data):
+        if isinstance(content, str):
+            content = content.encode()
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(IMPORT_URL, {'file': upload, **data},
+                                format='multipart')
+
+    @patch('recipe.views.RecipeViewSet.import_chunk_size', 2)
+    def test_import_ndjson(self):
+        lines = [
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.50',
+             'tags': [{'name': 'Lunch'}]},
+            {'title': 'Bad', 'time_minutes': 'soon', 'price': '1.00'},
+            {'title': 'Stew', 'time_minutes': 60, 'price': '4.00',
+             'ingredients': [{'name': 'Beef'}]},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines)
+        content += '\n{not json}\n'
+
+        res = self._upload('dump.ndjson', content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([e['line'] for e in res.data['errors']], [2, 4])
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual([tag.name for tag in soup.tags.all()], ['Lunch'])
+        stew = Recipe.objects.get(user=self.user, title='Stew')
+        self.assertEqual([i.name for i in stew.ingredients.all()], ['Beef'])
+
+    def test_import_csv(self):
+        content = (
+            'title,time_minutes,price,tags,ingredients\n'
+            'Tacos,20,3.00,Dinner;Mexican,Tortilla;Salt\n'
+        )
+
+        res = self._upload('dump.csv', content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(recipe.ingredients.count(), 2)
+
+    def test_import_undecodable_line_reported(self):
+        content = (b'{"title": "\xff\xfe"}\n'
+                   b'{"title": "Soup", "time_minutes": 10, "price": "2.50"}\n')
+
+        res = self._upload('dump.ndjson', content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual([e['line'] for e in res.data['errors']], [1])
+
+    def test_import_csv_undecodable_row_reported(self):
+        content = (b'title,time_minutes,price\n'
+                   b'Tacos \xff,20,3.00\n'
+                   b'Soup,10,2.50\n')
+
+        res = self._upload('dump.csv', content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual([e['line'] for e in res.data['errors']], [2])
+
+    def test_import_unknown_format(self):
+        res = self._upload('dump.txt', 'title\n')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SearchRecipeAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _search(self, terms, **params):
+        res = self.client.get(RECIPE_URL, {'search': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def _titles(self, res):
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_title_and_description(self):
+        create_recipe(user=self.user, title='Thai green curry',
+                      description='Quick weeknight dinner')
+        create_recipe(user=self.user, title='Pancakes',
+                      description='Fluffy breakfast')
 
+        self.assertEqual(self._titles(self._search('curries')),
+                         ['Thai green curry'])
+        self.assertEqual(self._titles(self._search('breakfast')),
+                         ['Pancakes'])
 
+    def test_search_tag_and_ingredient_names(self):
+        recipe = create_recipe(user=self.user, title='Soup')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Lentils'))
+
+        self.assertEqual(self._titles(self._search('vegan lentils')),
+                         ['Soup'])
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        self.assertEqual(self._titles(self._search('vegan')), [])
+        self.assertEqual(self._titles(self._search('vegetarian')), ['Soup'])
+
+        recipe.tags.clear()
+        self.assertEqual(self._titles(self._search('vegetarian')), [])
+
+    def test_search_updated_recipe(self):
+        recipe = create_recipe(user=self.user, title='Stew')
+
+        self.client.patch(detail_url(recipe.id), {'title': 'Chili'})
+
+        self.assertEqual(self._titles(self._search('chili')), ['Chili'])
+        self.assertEqual(self._titles(self._search('stew')), [])
+
+    def test_search_bulk_created_recipes(self):
+        payload = [{'title': f'Bulk curry {i}', 'time_minutes': 5,
+                    'price': '1.00', 'tags': [{'name': 'Spicy'}]}
+                   for i in range(3)]
+        self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(len(self._titles(self._search('spicy curry'))), 3)
+
+    def test_search_ranked(self):
+        create_recipe(user=self.user, title='Rice pudding',
+                      description='Made with rice')
+        create_recipe(user=self.user, title='Fried rice',
+                      description='Rice rice rice with egg')
+        create_recipe(user=self.user, title='Omelette',
+                      description='Serve with rice')
+
+        titles = self._titles(self._search('rice'))
+
+        self.assertEqual(titles[-1], 'Omelette')
+        self.assertEqual(set(titles[:2]), {'Rice pudding', 'Fried rice'})
+
+    def test_search_paginated(self):
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Curry {i}',
+                          description='curry ' * i)
+
+        first = self._search('curry', page_size=2)
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+
+        titles = (self._titles(first) + self._titles(second) +
+                  self._titles(third))
+        self.assertEqual(sorted(titles), [f'Curry {i}' for i in range(5)])
+        self.assertIsNone(third.data['next'])
+
+    def test_search_paginated_through_tied_ranks(self):
+        for i in range(7):
+            create_recipe(user=self.user, title=f'Curry {i}',
+                          description='curry')
+        create_recipe(user=self.user, title='Curry curry curry',
+                      description='curry')
+
+        res = self._search('curry', page_size=2)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        for _ in range(10):
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+            ids += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+
+    def test_search_syntax_and_scope(self):
+        create_recipe(user=self.user, title='Beef curry')
+        create_recipe(user=self.user, title='Chicken curry')
+        other = create_user(email='other@example.com',
+                            password='testpass123')
+        create_recipe(user=other, title='Lamb curry')
+
+        self.assertEqual(self._titles(self._search('curry -beef')),
+                         ['Chicken curry'])
+        self.assertEqual(len(self._titles(self._search('curry'))), 2)
+
+
+class RangeOrderingRecipeAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+        for title, time_minutes, price in [('Salad', 10, '4.00'),
+                                           ('Toast', 5, '1.50'),
+                                           ('Roast', 90, '20.00'),
+                                           ('Soup', 30, '4.00')]:
+            create_recipe(user=self.user, title=title,
+                          time_minutes=time_minutes, price=Decimal(price))
+
+    def _titles(self, **params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_filter_by_time_and_price(self):
+        self.assertEqual(self._titles(max_time=30),
+                         ['Soup', 'Toast', 'Salad'])
+        self.assertEqual(self._titles(min_price='4', max_price='10'),
+                         ['Soup', 'Salad'])
+        self.assertEqual(self._titles(max_time=10, max_price='2'),
+                         ['Toast'])
+
+    def test_ordering(self):
+        self.assertEqual(self._titles(ordering='time_minutes'),
+                         ['Toast', 'Salad', 'Soup', 'Roast'])
+        # Equal prices fall back to id in the same direction.
+        self.assertEqual(self._titles(ordering='-price'),
+                         ['Roast', 'Soup', 'Salad', 'Toast'])
+        self.assertEqual(self._titles(ordering='price'),
+                         ['Toast', 'Salad', 'Soup', 'Roast'])
+
+    def test_ordering_paginated(self):
+        titles = []
+        res = self.client.get(RECIPE_URL, {'ordering': 'price',
+                                           'page_size': 1})
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(titles, ['Toast', 'Salad', 'Soup', 'Roast'])
+
+    def test_ordering_with_search(self):
+        create_recipe(user=self.user, title='Quick soup', time_minutes=3)
+
+        self.assertEqual(
+            self._titles(search='soup', ordering='time_minutes'),
+            ['Quick soup', 'Soup'])
+
+    def test_invalid_parameters_rejected(self):
+        for params in [{'max_time': 'soon'}, {'min_price': '-1'},
+                       {'max_price': '1000'}, {'ordering': 'title'},
+                       {'ordering': 'price,user'}]:
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_range_query_uses_composite_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                queryset = Recipe.objects.filter(
+                    user=self.user, time_minutes__lte=30).order_by(
+                    'time_minutes', 'id')
+                plan = queryset.explain()
+            finally:
+                cursor.execute('RESET enable_seqscan')
+
+        self.assertIn('recipe_user_time_idx', plan)
+
+
+@override_settings(RECIPE_IMAGE_SYNC=True)
 class ImageUploadTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -452,24 +1070,146 @@ class ImageUploadTests(TestCase):
         )
         self.client.force_authenticate(self.user)
         self.recipe = create_recipe(user=self.user)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
 
-    def tearDown(self):
-        self.recipe.image.delete()
-
-    def test_upload_image(self):
+    def _upload(self, img, image_format='JPEG', **save_options):
         url = image_upload_url(self.recipe.id)
         with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
-            img = Image.new('RGB', (10, 10))
-            img.save(image_file, format='JPEG')
+            img.save(image_file, format=image_format, **save_options)
             image_file.seek(0)
-            res = self.client.post(url, {'image': image_file},
-                                   format='multipart')
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(url, {'image': image_file},
+                                        format='multipart')
+
+    def test_upload_image(self):
+        res = self._upload(Image.new('RGB', (10, 10)))
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_renditions(self):
+        exif = Image.Exif()
+        exif[0x010e] = 'secret description'
+        self._upload(Image.new('RGB', (2000, 1000)), exif=exif)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertEqual(set(res.data['image_renditions']),
+                         {'thumb', 'medium', 'large'})
+        self.recipe.refresh_from_db()
+        medium = self.recipe.image_renditions['medium']
+        with Image.open(recipe_image_storage.path(medium['webp'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (640, 320))
+        with Image.open(recipe_image_storage.path(medium['jpeg'])) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertFalse(image.getexif())
+        with Image.open(self.recipe.image.path) as image:
+            self.assertFalse(image.getexif())
+
+    def test_renditions_shrunk_from_drafted_jpeg(self):
+        thumbnail = Image.Image.thumbnail
+        sizes = []
+
+        def spy(image, size, *args, **kwargs):
+            sizes.append(image.size)
+            return thumbnail(image, size, *args, **kwargs)
+
+        with patch.object(Image.Image, 'thumbnail', spy):
+            self._upload(Image.new('RGB', (4000, 2000)))
+
+        # Decoded at 1/2 scale, then each size made from the previous.
+        self.assertEqual(sizes, [(2000, 1000), (1280, 640), (640, 320)])
+
+    def test_failed_render_leaves_stripped_original(self):
+        exif = Image.Exif()
+        exif[0x8825] = {1: 'N', 2: (51.0, 30.0, 0.0)}
+        with patch('recipe.images._render', side_effect=OSError):
+            res = self._upload(Image.new('RGB', (100, 100)), exif=exif)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+        with Image.open(self.recipe.image.path) as image:
+            self.assertFalse(image.getexif())
+
+    def test_upload_image_keeps_transparency(self):
+        img = Image.new('RGBA', (100, 100), (255, 0, 0, 0))
+        img.paste((0, 0, 255, 255), (0, 0, 50, 100))
+        self._upload(img, image_format='PNG')
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((75, 50))[3], 0)
+        medium = self.recipe.image_renditions['medium']
+        with Image.open(recipe_image_storage.path(medium['webp'])) as image:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((75, 50))[3], 0)
+        with Image.open(recipe_image_storage.path(medium['jpeg'])) as image:
+            self.assertEqual(image.mode, 'RGB')
+            self.assertGreater(min(image.getpixel((75, 50))), 240)
+
+    def test_identical_uploads_share_files(self):
+        self._upload(Image.new('RGB', (100, 100)))
+        other = self.recipe
+        other.refresh_from_db()
+        self.recipe = create_recipe(user=self.user)
+
+        self._upload(Image.new('RGB', (100, 100)))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(self.recipe.image_renditions,
+                         other.image_renditions)
+
+    def test_upload_image_stored_by_hash(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            digest = hashlib.sha256(image_file.read()).hexdigest()
+            image_file.seek(0)
+            self.client.post(image_upload_url(self.recipe.id),
+                             {'image': image_file}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name,
+                         f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_image_too_large(self):
+        res = self._upload(Image.effect_noise((50, 50), 64).convert('RGB'))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('at most 100 bytes', str(res.data['image']))
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_upload_image_too_many_pixels(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+        upload = SimpleUploadedFile('big.jpg', buffer.getvalue())
+        with patch('PIL.Image.Image.load') as load:
+            res = self.client.post(image_upload_url(self.recipe.id),
+                                   {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', str(res.data['image']))
+        load.assert_not_called()
+
+    def test_upload_image_unsupported_format(self):
+        res = self._upload(Image.new('RGB', (10, 10)), image_format='GIF')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_upload_image_bad_request(self):
         url = image_upload_url(self.recipe.id)
         res = self.client.post(url, {'image': 'notimage'},
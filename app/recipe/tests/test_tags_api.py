@@ -7,10 +7,13 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.queries import query_budget
+from recipe.autocomplete import trigram_available
 from recipe.serializers import TagSerializer
 from core.models import Tag, Recipe
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 
 def create_user(email="test@example.com", password="testpass123"):
@@ -45,9 +48,18 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_retrieve_tags_query_budget(self):
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        with query_budget(max_queries=1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 5)
+
     def test_tags_limited_to_user(self):
         other_user = create_user(email="user2@example.com")
         tag = Tag.objects.create(user=self.user, name="Comfort Food")
@@ -55,9 +67,9 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_update_tag(self):
@@ -73,6 +85,16 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         tag = Tag.objects.create(user=self.user, name='Breakfast')
 
@@ -99,8 +121,8 @@ class PrivateTagsApiTests(TestCase):
         serializer2 = TagSerializer(tag2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_filtered_tags_unique(self):
         tag = Tag.objects.create(
@@ -129,4 +151,70 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated_by_name(self):
+        for name in ['Apple', 'Banana', 'Cherry']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [tag['name'] for tag in res.data['results']]
+
+        self.assertEqual(names, ['Cherry', 'Banana', 'Apple'])
+        self.assertIsNone(res.data['next'])
+
+
+class AutocompleteTagsApiTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _recipe(self, *tags):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('1.00'))
+        recipe.tags.add(*tags)
+
+    def test_prefix_ranked_by_usage(self):
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        dim_sum = Tag.objects.create(user=self.user, name='Dim sum')
+        Tag.objects.create(user=self.user, name='Dip')
+        Tag.objects.create(user=self.user, name='Breakfast')
+        self._recipe(dinner, dim_sum)
+        self._recipe(dim_sum)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'di'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['name'], tag['usage']) for tag in res.data],
+            [('Dim sum', 2), ('Dinner', 1), ('Dip', 0)])
+
+    def test_limit_and_scope(self):
+        other = create_user(email='other@example.com')
+        Tag.objects.create(user=other, name='Vegan')
+        for name in ('Vegan', 'Vegetarian', 'Veggie'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'VEG', 'limit': 2})
+
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Vegan', 'Vegetarian'])
+
+    def test_fuzzy_match(self):
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        Tag.objects.create(user=self.user, name='Mediterranean')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'mediteranean'})
+
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Mediterranean'])
+
+    def test_query_required(self):
+        res = self.client.get(AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,81 @@
+"""
+Bounded-memory handling of recipe image uploads.
+
+`BoundedUploadHandler` streams every file straight to a temporary file
+in fixed chunks, hashing it on the way so the content-addressed storage
+can move it into place without reading it again, and stops writing once
+the size limit is passed. `HeaderCheckedImageField` validates what
+Pillow can tell from the image header (format and pixel dimensions)
+instead of decoding the image, which DRF's ImageField does, and hands
+on a copy without metadata (recipe.metadata).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import serializers
+
+from recipe.metadata import CorruptImage, strip_metadata
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        # Past the limit the rest is only counted; the field rejects it.
+        if self.max_size is None or self.received <= self.max_size:
+            self.sha256.update(raw_data)
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if self.max_size is None or file_size <= self.max_size:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HeaderCheckedImageField(serializers.ImageField):
+    default_error_messages = {
+        'too_large': 'Image files may be at most {max_size} bytes.',
+        'too_many_pixels': 'Images may have at most {max_pixels} pixels.',
+        'invalid_format': 'Unsupported image format, use one of {formats}.',
+    }
+
+    def to_internal_value(self, data):
+        # FileField checks only; ImageField would decode the image.
+        file = serializers.FileField.to_internal_value(self, data)
+        if file.size > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            self.fail('too_large',
+                      max_size=settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE)
+        try:
+            # Image.open reads the header only; pixels load on demand.
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+        except (Image.DecompressionBombError, OSError, SyntaxError):
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+
+        if image_format not in settings.RECIPE_IMAGE_FORMATS:
+            self.fail('invalid_format',
+                      formats=', '.join(settings.RECIPE_IMAGE_FORMATS))
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+        file.content_type = Image.MIME.get(image_format)
+        try:
+            return strip_metadata(file, image_format)
+        except CorruptImage:
+            self.fail('invalid_image')
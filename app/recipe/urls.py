@@ -5,6 +5,7 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
+from core.async_views import async_read_urls
 from recipe import views
 
 router = DefaultRouter()
@@ -15,5 +16,6 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_read_urls(router.urls,
+                                     exclude=['recipe-export']))),
 ]
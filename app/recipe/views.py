@@ -4,22 +4,52 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+    prefetch_related_objects,
+)
+from django.http import StreamingHttpResponse
 from rest_framework import (
     viewsets,
     mixins,
     status
     )
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 
+from recipe import importers
+from recipe.autocomplete import autocomplete
+from recipe.cache import CachedListMixin
+from recipe.conditional import ConditionalRecipeMixin
+from recipe.filters import (
+    RecipeOrderingFilter,
+    RecipeRangeFilter,
+    RecipeSearchFilter,
+    )
+from recipe.renderers import NDJSONRenderer
+from recipe.uploads import BoundedUploadHandler
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+    )
 from recipe.serializers import (
+    AutocompleteSerializer,
     RecipeDetailSerializer,
     RecipeSerializer,
     TagSerializer,
     RecipeImageSerializer,
     )
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    )
 from core.models import (
     Ingredient,
     Recipe,
@@ -40,14 +70,32 @@ from core.models import (
                 OpenApiTypes.STR,
                 description='Comma seprated list of ingredient IDs to filter'
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match recipes having any (default) or all '
+                            'of the given tags/ingredients'
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalRecipeMixin,
+                    CachedListMixin,
+                    viewsets.ModelViewSet):
     serializer_class = RecipeDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication,
+                              SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Recipe.objects.all()
+    pagination_class = RecipeCursorPagination
+    filter_backends = [RecipeSearchFilter, RecipeRangeFilter,
+                       RecipeOrderingFilter]
+    ordering = ['-id']
+    prefetch_actions = ['list', 'retrieve']
+    bulk_max_items = 5000
+    export_chunk_size = 500
+    import_chunk_size = 500
+    import_max_errors = 1000
 
     def _params_to_ints(self, qs):
         return [int(str_id) for str_id in qs.split(',')]
@@ -55,20 +103,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': ['Expected "any" or "all".']})
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_related(
+                queryset, 'ingredients', ingredient_ids, match)
 
-        return queryset.filter(
+        queryset = queryset.filter(
           user=self.request.user
-          ).order_by('-id').distinct()
+          ).order_by('-id')
+
+        return self._prefetch_related(queryset)
+
+    def _filter_related(self, queryset, relation, ids, match):
+        """Filter on a M2M relation through semi-joins, not a JOIN.
+
+        'any' is a correlated EXISTS and 'all' a grouped IN subquery, so
+        no DISTINCT pass over full recipe rows is needed in either mode.
+        """
+        field = getattr(Recipe, relation).field
+        target = field.m2m_reverse_field_name()
+        rows = field.remote_field.through.objects.filter(
+            **{f'{target}__in': ids})
+        if match == 'all':
+            # (recipe, target) is unique in the through table, so a plain
+            # count per recipe tells whether every id matched.
+            return queryset.filter(id__in=rows.values('recipe').annotate(
+                matched=Count(target)
+            ).filter(matched=len(set(ids))).values('recipe'))
+        return queryset.filter(Exists(rows.filter(recipe=OuterRef('pk'))))
+
+    def _prefetch_related(self, queryset):
+        if self.action not in self.prefetch_actions:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        prefetch_fields = getattr(serializer_class, 'prefetch_fields', [])
+        return queryset.prefetch_related(*prefetch_fields)
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'bulk', 'import_file'):
             return RecipeSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
@@ -77,14 +156,121 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['post', 'patch', 'delete'], detail=False,
+            url_path='bulk')
+    def bulk(self, request):
+        """Create, update or delete many recipes in one request.
+
+        POST takes a list of recipes, PATCH a list of partial recipes with
+        their `id` and DELETE a list of recipe IDs. Each item is reported
+        separately, so one bad item does not reject the rest.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'Expected a list of items.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'detail': f'At most {self.bulk_max_items} items allowed.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == 'DELETE':
+            return Response({'results': self._bulk_delete(items)})
+
+        instance = self.get_queryset() if request.method == 'PATCH' else None
+        serializer = self.get_serializer(
+            instance, data=items, many=True, partial=instance is not None)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+
+        return Response({'results': serializer.results})
+
+    @action(methods=['get'], detail=False, url_path='export',
+            renderer_classes=[NDJSONRenderer])
+    def export(self, request):
+        """Stream every matching recipe as newline-delimited JSON."""
+        response = StreamingHttpResponse(
+            self._export_lines(self.filter_queryset(self.get_queryset())),
+            content_type=NDJSONRenderer.media_type
+        )
+        response['Content-Disposition'] = 'attachment; filename=recipes.ndjson'
+        return response
+
+    def _export_lines(self, queryset):
+        """Read through a server-side cursor, prefetching per chunk."""
+        chunk = []
+        for recipe in queryset.iterator(chunk_size=self.export_chunk_size):
+            chunk.append(recipe)
+            if len(chunk) == self.export_chunk_size:
+                yield from self._export_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._export_chunk(chunk)
+
+    def _export_chunk(self, recipes):
+        serializer_class = self.get_serializer_class()
+        prefetch_related_objects(recipes, *serializer_class.prefetch_fields)
+        context = self.get_serializer_context()
+        for recipe in recipes:
+            data = serializer_class(recipe, context=context).data
+            yield NDJSONRenderer.render_line(data)
+
+    @action(methods=['post'], detail=False, url_path='import',
+            parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Import recipes from an uploaded NDJSON or CSV `file`."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or \
+            importers.guess_format(upload.name)
+        if file_format not in importers.FORMATS:
+            return Response(
+                {'format': [f'Expected one of {importers.FORMATS}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = importers.import_recipes(
+            request.user,
+            importers.read_records(upload, file_format),
+            chunk_size=self.import_chunk_size,
+            max_errors=self.import_max_errors,
+        )
+        return Response(report.as_dict())
+
+    def _bulk_delete(self, ids):
+        found = set(
+            self.get_queryset().filter(
+                id__in=[pk for pk in ids if isinstance(pk, int)]
+            ).values_list('id', flat=True)
+        )
+        Recipe.objects.filter(id__in=found).delete()
+        return [
+            {'index': index, 'status': 'deleted', 'id': pk}
+            if pk in found else
+            {'index': index, 'status': 'error',
+             'errors': {'id': ['Not found.']}}
+            for index, pk in enumerate(ids)
+        ]
+
+    @extend_schema(responses={202: RecipeImageSerializer})
     @action(methods=['post'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
+        request._request.upload_handlers = [BoundedUploadHandler(
+            request._request,
+            max_size=settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE,
+        )]
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # Renditions are produced in the background (recipe.images).
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -100,12 +286,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ]
        )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(CachedListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication,
+                              SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
 
     def get_queryset(self):
         assigned_only = bool(
@@ -113,18 +304,66 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
                 )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            field = getattr(Recipe, self.recipe_relation).field
+            queryset = queryset.filter(Exists(
+                field.remote_field.through.objects.filter(
+                    **{field.m2m_reverse_field_name(): OuterRef('pk')})
+            ))
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('-name').distinct()
+            ).order_by('-name')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True,
+                             description='Start of, or text close to, '
+                                         'the name'),
+            OpenApiParameter('limit', OpenApiTypes.INT,
+                             description='Number of suggestions '
+                                         '(default 10, max 50)'),
+        ],
+        responses=AutocompleteSerializer(many=True),
+    )
+    @action(methods=['get'], detail=False)
+    def autocomplete(self, request):
+        """Best matching names, most used in your recipes first."""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': ['This parameter is required.']})
+        try:
+            limit = int(request.query_params.get(
+                'limit', self.autocomplete_limit))
+        except ValueError:
+            raise ValidationError({'limit': ['Expected an integer.']})
+        limit = min(max(limit, 1), self.autocomplete_max_limit)
+
+        field = getattr(Recipe, self.recipe_relation).field
+        suggestions = autocomplete(
+            self.queryset.filter(user=request.user),
+            field.remote_field.through,
+            field.m2m_reverse_field_name(),
+            text,
+            limit,
+        )
+        return Response(AutocompleteSerializer(suggestions, many=True).data)
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['You already have an item with this name.']})
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    recipe_relation = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = TagSerializer
     queryset = Ingredient.objects.all()
+    recipe_relation = 'ingredients'
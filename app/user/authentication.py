@@ -0,0 +1,281 @@
+"""
+Token authentication backed by a two tier cache.
+
+Resolved tokens are kept in a small in-process LRU and, when it is
+shared by every server process (core.caches), in the Django cache, so
+most requests authenticate without the Token/User join. Entries are
+dropped by user.signals when a token is deleted or its user is saved
+(deactivation, password change). Other processes only see those drops
+through the shared tier, which is why the in-process entries live for a
+few seconds only.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from core import metrics
+from core.caches import shared_across_processes
+from user import tokens
+
+TOKEN_KEY = 'auth-token:{digest}'
+USER_KEY = 'auth-token:user:{user_id}'
+LOCAL_USER_KEY = 'user:{user_id}'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def token_cache_stats():
+    """Lookup counters of this process and the resulting hit rate."""
+    with _stats_lock:
+        stats = {event: _stats[event]
+                 for event in ('local_hits', 'shared_hits', 'misses')}
+    total = sum(stats.values())
+    hits = stats['local_hits'] + stats['shared_hits']
+    stats['hit_rate'] = hits / total if total else 0.0
+    return stats
+
+
+TOKEN_CACHE_COUNTERS = {
+    'local_hits': 'Tokens resolved from the per-process cache.',
+    'shared_hits': 'Tokens resolved from the shared cache.',
+    'misses': 'Tokens resolved from the database.',
+}
+
+for _event, _description in TOKEN_CACHE_COUNTERS.items():
+    metrics.register_counter(
+        f'auth_token_cache_{_event}_total', _description,
+        lambda event=_event: token_cache_stats()[event])
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    # A per-process cache would keep serving tokens revoked elsewhere.
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    return caches[alias] if shared_across_processes(alias) else None
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of resolved (user, token) pairs with a TTL."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires, user, token = entry
+            if expires <= time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return user, token
+
+    def set(self, digest, user, token):
+        timeout = settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT
+        size = settings.AUTH_TOKEN_LOCAL_CACHE_SIZE
+        if timeout <= 0 or size <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + timeout, user, token)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def delete(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            stale = [digest for digest, entry in self._entries.items()
+                     if entry[1].pk == user_id]
+            for digest in stale:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalTokenCache()
+
+
+def _evict_token(key):
+    digest = _digest(key)
+    local_cache.delete(digest)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(TOKEN_KEY.format(digest=digest))
+
+
+def _evict_user(user_id):
+    local_cache.delete_user(user_id)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(USER_KEY.format(user_id=user_id))
+
+
+def _now_and_on_commit(func, *args):
+    func(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: func(*args))
+
+
+def invalidate_token(key):
+    """Forget a token now and again once the deleting transaction commits.
+
+    The second eviction covers a request that re-cached the row between
+    the write and its commit.
+    """
+    _now_and_on_commit(_evict_token, key)
+
+
+def invalidate_user(user_id):
+    """Forget the cached user behind every token of `user_id`."""
+    _now_and_on_commit(_evict_user, user_id)
+
+
+def resolve_user(user_id):
+    """Active user `user_id` through the cache tiers, or None."""
+    key = LOCAL_USER_KEY.format(user_id=user_id)
+    cached = local_cache.get(key)
+    if cached is not None:
+        _count('local_hits')
+        user = cached[0]
+    else:
+        shared = _shared_cache()
+        user = None
+        if shared is not None:
+            user = shared.get(USER_KEY.format(user_id=user_id))
+        if user is not None:
+            _count('shared_hits')
+        else:
+            _count('misses')
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is None:
+                return None
+            if shared is not None:
+                shared.set(USER_KEY.format(user_id=user_id), user,
+                           timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        local_cache.set(key, user, None)
+    return copy.copy(user) if user.is_active else None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` that resolves keys through the token cache."""
+
+    def authenticate_credentials(self, key):
+        digest = _digest(key)
+        cached = local_cache.get(digest)
+        if cached is not None:
+            _count('local_hits')
+        else:
+            cached = self._get_shared(key, digest)
+            if cached is not None:
+                _count('shared_hits')
+                local_cache.set(digest, *cached)
+        if cached is None:
+            _count('misses')
+            user, token = super().authenticate_credentials(key)
+            self._set_shared(digest, user, token)
+            local_cache.set(digest, user, token)
+            cached = user, token
+
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        # Views may modify request.user; keep the cached copy pristine.
+        return copy.copy(user), token
+
+    def _get_shared(self, key, digest):
+        shared = _shared_cache()
+        if shared is None:
+            return None
+        entry = shared.get(TOKEN_KEY.format(digest=digest))
+        if entry is None:
+            return None
+        user_id, created = entry
+        user = shared.get(USER_KEY.format(user_id=user_id))
+        if user is None:
+            return None
+        token = self.get_model()(key=key, user_id=user_id, created=created)
+        token.user = user
+        return user, token
+
+    def _set_shared(self, digest, user, token):
+        shared = _shared_cache()
+        if shared is None:
+            return
+        timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+        shared.set_many({
+            TOKEN_KEY.format(digest=digest): (user.pk, token.created),
+            USER_KEY.format(user_id=user.pk): user,
+        }, timeout=timeout)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Bearer authentication with signed access tokens (user.tokens).
+
+    The token is verified in memory and the user comes from the token
+    cache, so a warm request makes no query.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header.'))
+        try:
+            claims = tokens.decode(auth[1].decode(), tokens.ACCESS)
+        except (UnicodeError, tokens.InvalidToken):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = resolve_user(claims['user_id'])
+        if user is None:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    target_class = 'user.authentication.SignedTokenAuthentication'
+    name = 'signedTokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return build_bearer_security_scheme_object(
+            header_name='Authorization', token_prefix=self.target.keyword)
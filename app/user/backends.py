@@ -0,0 +1,115 @@
+"""
+Authentication backend that bounds the cost of password hashing.
+
+Password checks run on a small per-process thread pool. A process
+accepts at most LOGIN_MAX_PENDING checks at a time (running or queued)
+and answers the rest with 503 straight away, so a login storm cannot
+occupy every worker with PBKDF2 rounds while token requests queue up
+behind it. Admitted checks still hold their request thread, so the
+limit has to stay below the threads of a worker (scripts/run.sh).
+Database access stays in the request thread; the pool only hashes.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_pending = 0
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+
+
+def _get_executor():
+    """The pool of this process, created after any fork."""
+    global _executor, _executor_pid, _pending
+    with _lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.LOGIN_HASH_WORKERS,
+                thread_name_prefix='login-hash',
+            )
+            _executor_pid = os.getpid()
+            _pending = 0
+        return _executor
+
+
+def _admit():
+    global _pending
+    with _lock:
+        if _pending >= settings.LOGIN_MAX_PENDING:
+            return False
+        _pending += 1
+        return True
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _verify(password, encoded):
+    """(is_correct, new hash if the stored one is outdated)."""
+    if encoded is None:
+        # Hash anyway so unknown emails take as long as wrong passwords.
+        make_password(password)
+        return False, None
+    outdated = []
+    is_correct = check_password(password, encoded, setter=outdated.append)
+    return is_correct, make_password(password) if outdated else None
+
+
+def run_hashing(func, *args):
+    """Run `func` on the login pool, or raise LoginBusy."""
+    executor = _get_executor()
+    if not _admit():
+        raise LoginBusy()
+    future = executor.submit(func, *args)
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=settings.LOGIN_TIMEOUT)
+    except FutureTimeoutError:
+        raise LoginBusy()
+
+
+class PooledModelBackend(ModelBackend):
+    """`ModelBackend` hashing on the login pool.
+
+    Hashes made by a hasher other than the first of PASSWORD_HASHERS (or
+    with outdated parameters) are replaced on the next successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None,
+                     **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            user = None
+
+        is_correct, rehashed = run_hashing(
+            _verify, password, user.password if user else None)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if rehashed:
+            user.password = rehashed
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmark import measure, register, rolled_back
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    local_cache,
+)
+
+
+@register('auth')
+def auth(stdout, scale=1):
+    """Authenticate the same request repeatedly with each scheme."""
+    requests = 1000 * scale
+    factory = APIRequestFactory()
+    stdout.write(f'{"scheme":>10} {"ms":>10} {"req/s":>10} {"queries":>8}')
+    with rolled_back():
+        user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123')
+        key = Token.objects.create(user=user).key
+        access = tokens.issue(user.pk, tokens.ACCESS)
+        schemes = [
+            ('db', TokenAuthentication(), f'Token {key}'),
+            ('cached', CachedTokenAuthentication(), f'Token {key}'),
+            ('signed', SignedTokenAuthentication(), f'Bearer {access}'),
+        ]
+        for name, scheme, header in schemes:
+            request = Request(factory.get('/', HTTP_AUTHORIZATION=header))
+            local_cache.clear()
+            scheme.authenticate(request)
+
+            def run():
+                for _ in range(requests):
+                    scheme.authenticate(request)
+
+            ms, queries = measure(run, repeat=3)
+            stdout.write(f'{name:>10} {ms:>10.2f} '
+                         f'{requests / ms * 1000:>10.0f} {queries:>8}')
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from django.urls import URLResolver, get_resolver
+from rest_framework.settings import api_settings
+
+from core.caches import shared_across_processes
+from user.authentication import SignedTokenAuthentication
+
+
+def _authentication_classes(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _authentication_classes(pattern.url_patterns)
+            continue
+        view = getattr(pattern.callback, 'cls', None)
+        yield from getattr(view, 'authentication_classes', ())
+
+
+def signed_tokens_enabled():
+    """Whether any routed view authenticates with signed tokens."""
+    classes = list(api_settings.DEFAULT_AUTHENTICATION_CLASSES)
+    classes += _authentication_classes(get_resolver().url_patterns)
+    return any(issubclass(cls, SignedTokenAuthentication) for cls in classes)
+
+
+@register()
+def check_deny_list_shared(app_configs, **kwargs):
+    """Stop the server scripts, which migrate first, on a local deny-list."""
+    alias = settings.AUTH_DENY_LIST_CACHE_ALIAS
+    if shared_across_processes(alias) or not signed_tokens_enabled():
+        return []
+    return [Error(
+        f'The token deny-list cache {alias!r} is not shared by the '
+        f'{settings.SERVER_PROCESSES} server processes, so revoked and '
+        f'rotated tokens would still be accepted by the others.',
+        hint='Set CACHE_BACKEND/CACHE_LOCATION to a shared backend such '
+             'as Redis, or AUTH_DENY_LIST_CACHE_ALIAS to such a cache.',
+        id='user.E001',
+    )]
@@ -4,8 +4,12 @@ from django.contrib.auth import (
     )
 from rest_framework import serializers
 
+from core.metrics import TimedDataMixin
+from user import tokens
+from user.authentication import resolve_user
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ['email', 'password', 'name']
@@ -47,3 +51,42 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class SignedTokenSerializer(serializers.Serializer):
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+    expires_in = serializers.IntegerField(read_only=True)
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            claims = tokens.decode(value, tokens.REFRESH)
+        except tokens.InvalidToken as exc:
+            raise serializers.ValidationError(str(exc))
+        self.claims = claims
+        return value
+
+    def validate(self, attrs):
+        user = resolve_user(self.claims['user_id'])
+        if user is None:
+            raise serializers.ValidationError(
+                'User inactive or deleted.', code='authorization')
+        attrs['user'] = user
+        return attrs
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+    def validate_token(self, value):
+        try:
+            self.claims = tokens.decode(value, verify_expiry=False)
+        except tokens.RevokedToken:
+            self.claims = None
+        except tokens.InvalidToken as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
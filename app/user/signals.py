@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_on_token_delete(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_on_user_change(sender, instance, **kwargs):
+    # Covers deactivation and password changes, which both save the user.
+    invalidate_user(instance.pk)
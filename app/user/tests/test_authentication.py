@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import authentication
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_lookup(self):
+        self.client.get(ME_URL)
+        before = authentication.token_cache_stats()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        after = authentication.token_cache_stats()
+        self.assertEqual(after['local_hits'], before['local_hits'] + 1)
+        self.assertGreater(after['hit_rate'], 0)
+
+    def test_shared_cache_used_after_local_expiry(self):
+        self.client.get(ME_URL)
+        authentication.local_cache.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_TOKEN_CACHE_ALIAS='',
+                       AUTH_TOKEN_LOCAL_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    @override_settings(SERVER_PROCESSES=4)
+    def test_process_local_shared_tier_skipped(self):
+        self.client.get(ME_URL)
+        authentication.local_cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_rejected(self):
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_refreshes_user(self):
+        self.client.get(ME_URL)
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        request = self.client.get(ME_URL).wsgi_request
+
+        self.assertTrue(request.user.check_password('newpass123'))
+
+    def test_update_does_not_leak_into_cache(self):
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'Updated'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated')
@@ -0,0 +1,129 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TOKEN_URL = reverse('user:token')
+
+HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+class PooledModelBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123')
+        self.client = APIClient()
+
+    def test_authenticate(self):
+        self.assertEqual(
+            authenticate(email='test@example.com', password='testpass123'),
+            self.user)
+        self.assertIsNone(
+            authenticate(email='test@example.com', password='wrong'))
+        self.assertIsNone(
+            authenticate(email='nobody@example.com', password='testpass123'))
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(
+            authenticate(email='test@example.com', password='testpass123'))
+
+    @override_settings(PASSWORD_HASHERS=HASHERS[::-1])
+    def _set_md5_password(self):
+        self.user.set_password('testpass123')
+        self.user.save()
+
+    @override_settings(PASSWORD_HASHERS=HASHERS)
+    def test_outdated_hash_upgraded_on_login(self):
+        self._set_md5_password()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+        authenticate(email='test@example.com', password='testpass123')
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    @override_settings(LOGIN_MAX_PENDING=0)
+    def test_login_rejected_when_pool_full(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'testpass123'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    # scripts/run.sh sizing: 2 threads per worker leave 1 login slot.
+    @override_settings(LOGIN_MAX_PENDING=1, LOGIN_HASH_WORKERS=1)
+    def test_logins_beyond_slots_rejected_while_held(self):
+        held = threading.Semaphore(0)
+        release = threading.Event()
+
+        def hold(*args):
+            held.release()
+            release.wait(5)
+            return False, None
+
+        def login():
+            try:
+                authenticate(email='test@example.com', password='wrong')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=login)
+                   for _ in range(settings.LOGIN_MAX_PENDING)]
+        with patch('user.backends._verify', side_effect=hold):
+            for thread in threads:
+                thread.start()
+                self.assertTrue(held.acquire(timeout=5))
+            try:
+                res = self.client.post(TOKEN_URL, {
+                    'email': 'test@example.com', 'password': 'testpass123'})
+            finally:
+                release.set()
+                for thread in threads:
+                    thread.join()
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'testpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_TIMEOUT=0)
+    def test_login_rejected_on_timeout(self):
+        with patch('user.backends._verify',
+                   side_effect=lambda *args: time.sleep(0.1)):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'test@example.com', 'password': 'testpass123'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_login_throttled_per_email(self):
+        payload = {'email': 'Test@example.com', 'password': 'wrong'}
+        with patch('user.throttles.LoginEmailRateThrottle.THROTTLE_RATES',
+                   {'login_email': '2/min'}):
+            for _ in range(2):
+                self.client.post(TOKEN_URL, payload)
+            res = self.client.post(TOKEN_URL, {
+                'email': 'test@example.com', 'password': 'testpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_with_list_body(self):
+        res = self.client.post(TOKEN_URL, [1, 2], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,151 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.views import metrics_view
+from user import authentication, checks, tokens
+
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+
+
+class SignedTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123', name='Test')
+        self.client = APIClient()
+
+    def _pair(self):
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'testpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def _get_me(self, token):
+        return self.client.get(ME_URL, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_access_token_authenticates_without_queries(self):
+        access = self._pair()['access']
+        self._get_me(access)
+
+        with self.assertNumQueries(0):
+            res = self._get_me(access)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_bad_credentials(self):
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com', 'password': 'wrong'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tampered_token_rejected(self):
+        access = self._pair()['access']
+        kind, user_id, rest = access.split('.', 2)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+
+        res = self._get_me(f'{kind}.{other.pk}.{rest}')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_rejected(self):
+        access = tokens.issue(self.user.pk, tokens.ACCESS, lifetime=-1)
+
+        res = self._get_me(access)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_not_accepted_as_access(self):
+        refresh = self._pair()['refresh']
+
+        res = self._get_me(refresh)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_key_rotation(self):
+        access = self._pair()['access']
+        keys = {'1': 'old secret', '2': 'new secret'}
+        with override_settings(AUTH_SIGNING_KEYS={'1': 'x'}):
+            self.assertEqual(self._get_me(access).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+        with override_settings(AUTH_SIGNING_KEYS=keys,
+                               AUTH_SIGNING_KEY_VERSION='2'):
+            old = tokens.issue(self.user.pk, tokens.ACCESS)
+        with override_settings(AUTH_SIGNING_KEYS={'2': 'new secret'}):
+            self.assertEqual(self._get_me(old).status_code,
+                             status.HTTP_200_OK)
+
+    def test_refresh_rotates_pair(self):
+        refresh = self._pair()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._get_me(res.data['access']).status_code,
+                         status.HTTP_200_OK)
+        reused = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(reused.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_access_token(self):
+        access = self._pair()['access']
+        self._get_me(access)
+
+        res = self.client.post(REVOKE_URL, {'token': access})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._get_me(access).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_forged_token(self):
+        res = self.client.post(REVOKE_URL, {'token': 'a.1.2.1.x.sig'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deactivated_user_rejected(self):
+        access = self._pair()['access']
+        self._get_me(access)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self._get_me(access)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SERVER_PROCESSES=4)
+class ProcessLocalDenyListTests(TestCase):
+    def test_check_reports_process_local_deny_list(self):
+        errors = checks.check_deny_list_shared(None)
+
+        self.assertEqual([e.id for e in errors], ['user.E001'])
+
+    def test_check_skipped_without_signed_tokens(self):
+        with patch('user.checks.get_resolver') as resolver:
+            resolver.return_value.url_patterns = [
+                path('metrics', metrics_view)]
+
+            self.assertFalse(checks.signed_tokens_enabled())
+            self.assertEqual(checks.check_deny_list_shared(None), [])
+
+    def test_decode_fails_closed(self):
+        token = tokens.issue(1, tokens.ACCESS)
+
+        with self.assertRaises(ImproperlyConfigured):
+            tokens.decode(token, tokens.ACCESS)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_shared_backend_accepted(self):
+        self.assertEqual(checks.check_deny_list_shared(None), [])
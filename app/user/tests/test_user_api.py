@@ -1,9 +1,13 @@
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.queries import query_budget
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
@@ -16,6 +20,7 @@ def create_user(**params):
 
 class PublicUserApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_create_user_success(self):
@@ -128,6 +133,19 @@ class PrivateUserApiTests(TestCase):
             'email': self.user.email,
         })
 
+    def test_token_requests_query_budget(self):
+        cache.clear()
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        # The first request looks the token up, the rest hit the cache.
+        with query_budget(max_queries=1):
+            for _ in range(3):
+                res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_post_me_not_allowed(self):
         res = self.client.post(ME_URL, {})
 
@@ -0,0 +1,28 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per client IP."""
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per account, whatever IP they come from."""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': email.strip().lower(),
+        }
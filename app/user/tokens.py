@@ -0,0 +1,116 @@
+"""
+Signed, expiring access and refresh tokens.
+
+A token is `<type>.<user id>.<expiry>.<key version>.<id>.<signature>`,
+the signature being an HMAC-SHA256 of the other fields under the signing
+key of that version. Verifying one needs no database access; revoked
+token ids are kept in a deny-list in the cache until they would have
+expired anyway, so the list never outgrows the live tokens.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from core.caches import shared_across_processes
+
+ACCESS = 'a'
+REFRESH = 'r'
+
+DENY_KEY = 'auth-deny:{token_id}'
+DENY_LIST_NOT_SHARED = (
+    'AUTH_DENY_LIST_CACHE_ALIAS {alias!r} is not shared by the '
+    'SERVER_PROCESSES processes; set CACHE_BACKEND to a shared backend.'
+)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class RevokedToken(InvalidToken):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _signing_key(secret):
+    return hashlib.sha256(b'user.tokens:' + secret.encode()).digest()
+
+
+def _sign(payload, version):
+    try:
+        secret = settings.AUTH_SIGNING_KEYS[version]
+    except KeyError:
+        raise InvalidToken('Unknown signing key.')
+    digest = hmac.new(
+        _signing_key(secret), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def _deny_list():
+    alias = settings.AUTH_DENY_LIST_CACHE_ALIAS
+    # A revocation other processes cannot see would let the token be
+    # replayed there; refuse every token instead.
+    if not shared_across_processes(alias):
+        raise ImproperlyConfigured(DENY_LIST_NOT_SHARED.format(alias=alias))
+    return caches[alias]
+
+
+def issue(user_id, token_type, lifetime=None):
+    if lifetime is None:
+        lifetime = (settings.AUTH_ACCESS_TOKEN_LIFETIME
+                    if token_type == ACCESS
+                    else settings.AUTH_REFRESH_TOKEN_LIFETIME)
+    version = settings.AUTH_SIGNING_KEY_VERSION
+    expires = int(time.time()) + lifetime
+    payload = (f'{token_type}.{user_id}.{expires}.{version}.'
+               f'{secrets.token_urlsafe(9)}')
+    return f'{payload}.{_sign(payload, version)}'
+
+
+def issue_pair(user_id):
+    return {
+        'access': issue(user_id, ACCESS),
+        'refresh': issue(user_id, REFRESH),
+        'expires_in': settings.AUTH_ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def decode(token, token_type=None, verify_expiry=True):
+    """Claims dict of a valid token, else raise InvalidToken."""
+    payload, _, signature = token.rpartition('.')
+    parts = payload.split('.')
+    if len(parts) != 5:
+        raise InvalidToken('Malformed token.')
+    kind, user_id, expires, version, token_id = parts
+    if not hmac.compare_digest(signature.encode(),
+                               _sign(payload, version).encode()):
+        raise InvalidToken('Invalid signature.')
+    if token_type is not None and kind != token_type:
+        raise InvalidToken('Wrong token type.')
+    expires = int(expires)
+    if verify_expiry and expires <= time.time():
+        raise InvalidToken('Token expired.')
+    if _deny_list().get(DENY_KEY.format(token_id=token_id)):
+        raise RevokedToken('Token revoked.')
+    return {'type': kind, 'user_id': int(user_id), 'expires': expires,
+            'version': version, 'token_id': token_id}
+
+
+def revoke(claims):
+    """Deny a decoded token for the rest of its lifetime.
+
+    Returns False when it already was, so a refresh token raced by two
+    clients is only exchanged once.
+    """
+    remaining = int(claims['expires'] - time.time())
+    if remaining <= 0:
+        return True
+    return _deny_list().add(DENY_KEY.format(token_id=claims['token_id']), 1,
+                            timeout=remaining)
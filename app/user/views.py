@@ -1,10 +1,22 @@
+from drf_spectacular.utils import extend_schema
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    RefreshTokenSerializer,
+    RevokeTokenSerializer,
+    SignedTokenSerializer,
     )
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    )
+from user.throttles import LoginEmailRateThrottle, LoginRateThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -13,12 +25,53 @@ class CreateUserView(generics.CreateAPIView):
 
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
+    throttle_classes = [LoginRateThrottle, LoginEmailRateThrottle]
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
+class CreateSignedTokenView(generics.GenericAPIView):
+    """Exchange credentials for a signed access/refresh token pair."""
+    serializer_class = AuthTokenSerializer
+    throttle_classes = [LoginRateThrottle, LoginEmailRateThrottle]
+
+    @extend_schema(responses=SignedTokenSerializer)
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RefreshSignedTokenView(generics.GenericAPIView):
+    """Trade a refresh token for a new pair; the old one is revoked."""
+    serializer_class = RefreshTokenSerializer
+
+    @extend_schema(responses=SignedTokenSerializer)
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not tokens.revoke(serializer.claims):
+            raise ValidationError({'refresh': ['Token revoked.']})
+        user = serializer.validated_data['user']
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RevokeSignedTokenView(generics.GenericAPIView):
+    serializer_class = RevokeTokenSerializer
+
+    @extend_schema(responses={204: None})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if serializer.claims is not None:
+            tokens.revoke(serializer.claims)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication,
+                              SignedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
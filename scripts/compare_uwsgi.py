@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Compare uWSGI startup time and memory with the app preloaded in the
+master, as run.sh starts it, and loaded lazily in every worker.
+
+Run from the app directory, with the usual DB_* environment:
+
+    python /scripts/compare_uwsgi.py --workers 4
+
+Startup is the time until every worker can serve the app. RSS counts
+shared pages once per process, PSS divides them between the processes
+sharing them, so the PSS total is what the container really uses.
+"""
+import argparse
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return [int(child) for child in file.read().split()]
+
+
+def memory(pid):
+    """(RSS, PSS) of process `pid`, in KiB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def wait_until_ready(proc, workers, lazy):
+    """Read uWSGI's log until every worker has the app loaded."""
+    loads = spawned = 0
+    for line in proc.stderr:
+        if line.startswith('WSGI app 0') and 'ready in' in line:
+            loads += 1
+        elif line.startswith('spawned uWSGI worker'):
+            spawned += 1
+        if spawned == workers and loads == (workers if lazy else 1):
+            # Keep draining the log so uWSGI never blocks on it.
+            threading.Thread(target=proc.stderr.read, daemon=True).start()
+            return
+    raise RuntimeError(f'uWSGI exited with {proc.wait()}')
+
+
+def warm_up(port, requests):
+    for _ in range(requests):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10)
+        except urllib.error.HTTPError:
+            pass
+
+
+def run(workers, threads, lazy):
+    port = free_port()
+    args = [
+        'uwsgi', '--http-socket', f'127.0.0.1:{port}', '--master',
+        '--processes', str(workers), '--threads', str(threads),
+        '--enable-threads', '--single-interpreter', '--need-app',
+        '--die-on-term', '--module', 'app.wsgi',
+    ]
+    if lazy:
+        args.append('--lazy-apps')
+    start = time.perf_counter()
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    try:
+        wait_until_ready(proc, workers, lazy)
+        startup = time.perf_counter() - start
+        warm_up(port, workers * 4)
+        pids = [proc.pid] + children(proc.pid)
+        rss, pss = map(sum, zip(*(memory(pid) for pid in pids)))
+    finally:
+        proc.terminate()
+        proc.wait()
+    return startup, rss / 1024, pss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2)
+    options = parser.parse_args()
+
+    print(f'{"mode":>8} {"startup s":>10} {"RSS MiB":>10} {"PSS MiB":>10}')
+    for mode, lazy in (('preload', False), ('lazy', True)):
+        startup, rss, pss = run(options.workers, options.threads, lazy)
+        print(f'{mode:>8} {startup:>10.2f} {rss:>10.1f} {pss:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
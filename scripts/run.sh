@@ -2,9 +2,52 @@
 
 set -e
 
+# Sizing follows the CPU count unless set. Threads overlap the time
+# requests spend waiting on Postgres; each one holds a DB connection.
+CPUS=$(nproc)
+WSGI_WORKERS=${WSGI_WORKERS:-$((CPUS * 2 + 1))}
+WSGI_THREADS=${WSGI_THREADS:-2}
+# Logins wait for the password hash in a request thread; leave one
+# thread per worker to other requests during a login storm.
+LOGIN_SLOTS=$(( WSGI_THREADS > 1 ? WSGI_THREADS - 1 : 1 ))
+export LOGIN_MAX_PENDING=${LOGIN_MAX_PENDING:-$LOGIN_SLOTS}
+export LOGIN_HASH_WORKERS=${LOGIN_HASH_WORKERS:-$LOGIN_MAX_PENDING}
+# Idle workers are stopped down to WSGI_CHEAPER (0 keeps them all).
+WSGI_CHEAPER=${WSGI_CHEAPER:-$(( CPUS < WSGI_WORKERS ? CPUS : 0 ))}
+WSGI_TIMEOUT=${WSGI_TIMEOUT:-30}
+WSGI_MAX_REQUESTS=${WSGI_MAX_REQUESTS:-5000}
+WSGI_RELOAD_ON_RSS=${WSGI_RELOAD_ON_RSS:-0}
+# Lets the app's checks (run by migrate) refuse process-local caches.
+export SERVER_PROCESSES="$WSGI_WORKERS"
+
+# Workers add up their /metrics through here; counters restart with us.
+export METRICS_DIR=${METRICS_DIR:-/vol/metrics}
+mkdir -p "$METRICS_DIR"
+rm -f "$METRICS_DIR"/*.json
+
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+set -- --socket :9000 --master \
+    --processes "$WSGI_WORKERS" --threads "$WSGI_THREADS" \
+    --enable-threads --thunder-lock --single-interpreter \
+    --harakiri "$WSGI_TIMEOUT" \
+    --max-requests "$WSGI_MAX_REQUESTS" --max-requests-delta 50 \
+    --reload-on-rss "$WSGI_RELOAD_ON_RSS" \
+    --need-app --die-on-term --vacuum \
+    --module app.wsgi
+
+if [ "$WSGI_CHEAPER" -gt 0 ]; then
+    set -- "$@" --cheaper-algo busyness --cheaper "$WSGI_CHEAPER" \
+        --cheaper-initial "$WSGI_CHEAPER" --cheaper-step 1 \
+        --cheaper-overload 10
+fi
+
+# The app is loaded once in the master and shared copy-on-write by the
+# forked workers (see app/wsgi.py); WSGI_LAZY_APPS=1 loads it per worker.
+if [ "${WSGI_LAZY_APPS:-0}" = "1" ]; then
+    set -- "$@" --lazy-apps
+fi
 
+exec uwsgi "$@"
@@ -0,0 +1,25 @@
+#!/bin/sh
+
+set -e
+
+ASGI_WORKERS=${ASGI_WORKERS:-4}
+export SERVER_PROCESSES="$ASGI_WORKERS"
+# Requests get a thread each here, so logins only need bounding by the
+# hashing pool.
+export LOGIN_HASH_WORKERS=${LOGIN_HASH_WORKERS:-2}
+export LOGIN_MAX_PENDING=${LOGIN_MAX_PENDING:-8}
+
+# Workers add up their /metrics through here; counters restart with us.
+export METRICS_DIR=${METRICS_DIR:-/vol/metrics}
+mkdir -p "$METRICS_DIR"
+rm -f "$METRICS_DIR"/*.json
+
+python manage.py wait_for_db
+python manage.py collectstatic --noinput
+python manage.py migrate
+
+# Recipe, tag and ingredient reads run on ASYNC_DB_WORKERS threads per
+# worker; the proxy must speak HTTP to this port (APP_PROTOCOL=http).
+export ASYNC_READ_VIEWS=1
+uvicorn app.asgi:application --host 0.0.0.0 --port 9000 \
+    --workers "$ASGI_WORKERS" --proxy-headers --no-server-header